@@ -0,0 +1,58 @@
+# backend/cache.py
+import time
+from collections import OrderedDict
+
+from backend.metrics import CACHE_LOOKUPS
+
+
+class TTLCache:
+    """
+    Small in-process LRU cache whose entries also expire after `ttl` seconds
+    (or earlier, when set() is given an explicit expiry). Hits and misses are
+    counted under `name` in backend_cache_lookups_total.
+    """
+
+    def __init__(self, name, maxsize=1024, ttl=60.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            CACHE_LOOKUPS.labels(self.name, "hit").inc()
+            return entry[1]
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        CACHE_LOOKUPS.labels(self.name, "miss").inc()
+        return None
+
+    def set(self, key, value, expires_in=None):
+        ttl = self.ttl if expires_in is None else min(self.ttl, expires_in)
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
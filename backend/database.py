@@ -2,10 +2,27 @@
 import os
 import motor.motor_asyncio
 from dotenv import load_dotenv
+from backend.metrics import MongoCommandTimer
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
-client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI)
+client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI, event_listeners=[MongoCommandTimer()])
 db = client["animal_alerts_db"]   
 users_collection = db["users"]
 alerts_collection = db["alerts"]
+alerts_archive_collection = db["alerts_archive"]
+rollups_collection = db["alert_rollups"]
+
+
+async def ensure_indexes():
+    """Create the indexes the API queries rely on (no-op when they already exist)."""
+    # GET /alerts/me: equality on user_id, newest first, _id breaks timestamp ties
+    await alerts_collection.create_index(
+        [("user_id", 1), ("timestamp", -1), ("_id", -1)], name="user_timestamp"
+    )
+    # GET /alerts/stream resume: a user's alerts after a given id
+    await alerts_collection.create_index([("user_id", 1), ("_id", 1)], name="user_id_order")
+    # Retention: archive alerts older than a cutoff
+    await alerts_collection.create_index([("timestamp", 1)], name="timestamp")
+    # GET /alerts/stats: a user's daily rollups in a date range
+    await rollups_collection.create_index([("user_id", 1), ("day", 1)], name="user_day")
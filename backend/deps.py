@@ -1,7 +1,11 @@
 
+import os
+import time
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
+from backend.cache import TTLCache
 from backend.models import decode_access_token
 from backend.database import users_collection
 
@@ -10,7 +14,22 @@ from bson import ObjectId
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+# Detectors POST alerts with the same token over and over; skip the JWT
+# decode and the users lookup while the entries are fresh
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+token_cache = TTLCache("token", maxsize=4096, ttl=AUTH_CACHE_TTL)  # token -> user_id
+user_cache = TTLCache("user", maxsize=1024, ttl=AUTH_CACHE_TTL)    # user_id -> user doc
+
+
+def invalidate_user(user_id: str):
+    """Drop the cached user document; call after any update to the user."""
+    user_cache.invalidate(str(user_id))
+
+
+def _user_id_from_token(token: str) -> str:
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        return user_id
     try:
         payload = decode_access_token(token)
         user_id = payload.get("user_id")
@@ -18,11 +37,23 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
- 
-    user["id"] = str(user["_id"])
-    user.pop("_id", None)
-    user.pop("password", None)
-    return user
+    # Never trust a cached token past its own expiry
+    expires_in = payload["exp"] - time.time() if "exp" in payload else None
+    token_cache.set(token, user_id, expires_in)
+    return user_id
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    user_id = _user_id_from_token(token)
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await users_collection.find_one({"_id": ObjectId(user_id)})
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+
+        user["id"] = str(user["_id"])
+        user.pop("_id", None)
+        user.pop("password", None)
+        user_cache.set(user_id, user)
+    # Handlers get their own copy so they cannot change the cached one
+    return dict(user)
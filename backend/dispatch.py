@@ -0,0 +1,168 @@
+# backend/dispatch.py
+import asyncio
+import os
+import time
+from datetime import datetime
+
+from bson import ObjectId
+
+from backend.database import alerts_collection
+from backend.metrics import NOTIFICATION_JOBS, NOTIFICATION_QUEUE
+from backend.notification import NotificationCoalescer, send_animal_alert
+from backend.onesignal import CircuitOpenError, is_permanent
+from backend.onesignal import client as onesignal
+
+
+class NotificationDispatcher:
+    """
+    In-process notification fan-out so POST /alerts/ returns as soon as the
+    alert is stored. Jobs go through a bounded asyncio queue to `concurrency`
+    workers. Transient errors are retried by the OneSignal client only; when
+    it gives up, or its circuit is open, the job waits for the breaker's
+    reset window and tries again, for up to `max_wait` seconds. Rejected
+    requests (4xx) are not retried. Every step is recorded on the alert
+    document under "notification"; jobs that are rejected, wait too long,
+    do not fit in the queue, or are cut off by a shutdown or restart are
+    left there as "dead_letter".
+    """
+
+    def __init__(self, concurrency=4, maxsize=1000, max_wait=3600.0):
+        self.concurrency = concurrency
+        self.maxsize = maxsize
+        self.max_wait = max_wait
+        self._queue = None
+        self._workers = []
+        self._active = {}  # id(job) -> job being delivered
+
+    def start(self):
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        NOTIFICATION_QUEUE.set_function(self._queue.qsize)
+
+    async def recover(self):
+        """
+        Jobs only live in memory: alerts a previous run left "queued" or
+        "retrying" will never be delivered, so mark them dead_letter.
+        Call before start().
+        """
+        result = await alerts_collection.update_many(
+            {"notification.status": {"$in": ["queued", "retrying"]}},
+            {"$set": {
+                "notification.status": "dead_letter",
+                "notification.updated_at": datetime.utcnow(),
+                "notification.last_error": "backend restarted before delivery",
+            }},
+        )
+        if result.modified_count:
+            NOTIFICATION_JOBS.labels("dead_letter").inc(result.modified_count)
+            print(f"⚠️ {result.modified_count} notification(s) from the previous run marked dead_letter")
+        return result.modified_count
+
+    async def stop(self, timeout=10.0):
+        """
+        Give queued jobs `timeout` seconds to finish, then cancel the workers.
+        Jobs still queued or in flight are marked dead_letter.
+        """
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Stopping with {self._queue.qsize()} notification(s) still queued")
+        unfinished = list(self._active.values())
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        while not self._queue.empty():
+            unfinished.append(self._queue.get_nowait())
+            self._queue.task_done()
+        for job in unfinished:
+            NOTIFICATION_JOBS.labels("dead_letter").inc()
+            await self._set_status(job["alert_ids"], "dead_letter",
+                                   attempts=job.get("attempts", 0), last_error="backend stopped before delivery")
+
+    async def submit(self, alert_ids, send=send_animal_alert, **notification):
+        """
+        Queue send(**notification) for the stored alert(s). Never waits for OneSignal.
+        `alert_ids` is one id, or a list when a single push covers several alerts.
+        """
+        self.start()
+        if isinstance(alert_ids, str):
+            alert_ids = [alert_ids]
+        try:
+            self._queue.put_nowait({"alert_ids": alert_ids, "send": send, "notification": notification})
+        except asyncio.QueueFull:
+            NOTIFICATION_JOBS.labels("dropped").inc()
+            await self._set_status(alert_ids, "dead_letter", attempts=0, last_error="notification queue full")
+            return False
+        return True
+
+    async def _set_status(self, alert_ids, status, **fields):
+        try:
+            await alerts_collection.update_many(
+                {"_id": {"$in": [ObjectId(alert_id) for alert_id in alert_ids]}},
+                {"$set": {"notification": {"status": status, "updated_at": datetime.utcnow(), **fields}}},
+            )
+        except Exception as e:
+            print(f"⚠️ Could not record notification status for {', '.join(alert_ids)}: {e}")
+
+    async def _deliver(self, job):
+        alert_ids = job["alert_ids"]
+        deadline = time.monotonic() + self.max_wait
+        attempts = job["attempts"] = 0
+        while True:
+            try:
+                result = await job["send"](**job["notification"])
+                if not result:
+                    raise RuntimeError("OneSignal returned no result")
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                if isinstance(e, CircuitOpenError):
+                    # Nothing was sent: wait for the breaker instead of using up the job
+                    delay = e.retry_after
+                else:
+                    attempts = job["attempts"] = attempts + 1
+                    delay = onesignal.retry_after or onesignal.reset_timeout
+                if is_permanent(e) or time.monotonic() + delay > deadline:
+                    NOTIFICATION_JOBS.labels("dead_letter").inc()
+                    print(f"❌ Notification for alert(s) {', '.join(alert_ids)} gave up after {attempts} attempt(s): {error}")
+                    await self._set_status(alert_ids, "dead_letter", attempts=attempts, last_error=error)
+                    return
+                NOTIFICATION_JOBS.labels("retry").inc()
+                await self._set_status(alert_ids, "retrying", attempts=attempts, last_error=error)
+                await asyncio.sleep(delay)
+            else:
+                attempts += 1
+                NOTIFICATION_JOBS.labels("sent").inc()
+                await self._set_status(
+                    alert_ids, "sent",
+                    attempts=attempts,
+                    recipients=result.get("recipients", 0),
+                    onesignal_id=result.get("id"),
+                )
+                return
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            self._active[id(job)] = job
+            try:
+                await self._deliver(job)
+            except Exception as e:
+                print(f"❌ Notification worker error: {type(e).__name__}: {e}")
+            finally:
+                self._active.pop(id(job), None)
+                self._queue.task_done()
+
+
+dispatcher = NotificationDispatcher(
+    concurrency=int(os.getenv("NOTIFY_CONCURRENCY", "4")),
+    maxsize=int(os.getenv("NOTIFY_QUEUE_SIZE", "1000")),
+    max_wait=float(os.getenv("NOTIFY_MAX_WAIT", "3600")),
+)
+
+# Lower-level alerts are merged into per-user digests before reaching the dispatcher
+coalescer = NotificationCoalescer(dispatcher.submit)
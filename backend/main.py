@@ -1,15 +1,41 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from backend.routers.auth import router as auth_router
 from backend.routers.alert import router as alerts_router
 
-from backend.routers import server, users
+from backend.routers import metrics, server, users
+from backend.metrics import track_request_latency
+from backend.dispatch import coalescer, dispatcher
+from backend.onesignal import client as onesignal
+from backend.database import ensure_indexes
+from backend.rollups import ALERT_RETENTION_DAYS, retention_loop
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await ensure_indexes()
+    await onesignal.start()
+    await dispatcher.recover()
+    dispatcher.start()
+    retention = asyncio.create_task(retention_loop(ALERT_RETENTION_DAYS)) if ALERT_RETENTION_DAYS else None
+    yield
+    if retention is not None:
+        retention.cancel()
+    await coalescer.flush_all()
+    await dispatcher.stop()
+    await onesignal.aclose()
+
 
-app = FastAPI(title="Animal Alert Backend")
+app = FastAPI(title="Animal Alert Backend", lifespan=lifespan)
+app.middleware("http")(track_request_latency)
 
 app.include_router(auth_router)
 app.include_router(alerts_router)
 app.include_router(users.router) 
 app.include_router(server.router)
+app.include_router(metrics.router)
 
 
 @app.get("/")
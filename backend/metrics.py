@@ -0,0 +1,84 @@
+# backend/metrics.py
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+from pymongo import monitoring
+
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_SECONDS = Histogram(
+    "backend_request_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+    buckets=_BUCKETS,
+)
+MONGO_SECONDS = Histogram(
+    "backend_mongo_command_seconds",
+    "MongoDB command latency",
+    ["command", "collection", "outcome"],
+    buckets=_BUCKETS,
+)
+ONESIGNAL_SECONDS = Histogram(
+    "backend_onesignal_request_seconds",
+    "OneSignal API call latency",
+    ["outcome"],
+    buckets=_BUCKETS,
+)
+ONESIGNAL_REQUESTS = Counter(
+    "backend_onesignal_requests_total",
+    "OneSignal API calls by outcome",
+    ["outcome"],
+)
+ONESIGNAL_CIRCUIT = Gauge("backend_onesignal_circuit_open", "1 while the OneSignal circuit breaker is open")
+NOTIFICATION_JOBS = Counter(
+    "backend_notification_jobs_total",
+    "Background notification jobs by outcome (sent, retry, dead_letter, dropped)",
+    ["outcome"],
+)
+NOTIFICATION_PUSHES_SAVED = Counter(
+    "backend_notification_pushes_saved_total",
+    "Pushes avoided by merging alerts into digests",
+)
+STREAM_CLIENTS = Gauge("backend_stream_clients", "Connected alert stream clients")
+STREAM_OVERFLOWS = Counter("backend_stream_overflows_total", "Stream clients cut off because their buffer filled up")
+NOTIFICATION_QUEUE = Gauge("backend_notification_queue_depth", "Notification jobs waiting for a worker")
+CACHE_LOOKUPS = Counter(
+    "backend_cache_lookups_total",
+    "In-process cache lookups by result",
+    ["cache", "result"],
+)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Times every command the driver sends (find_one, insert_one, ...)."""
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        self._collections[event.request_id] = collection if isinstance(collection, str) else ""
+
+    def _observe(self, event, outcome):
+        collection = self._collections.pop(event.request_id, "")
+        MONGO_SECONDS.labels(event.command_name, collection, outcome).observe(event.duration_micros / 1e6)
+
+    def succeeded(self, event):
+        self._observe(event, "ok")
+
+    def failed(self, event):
+        self._observe(event, "error")
+
+
+async def track_request_latency(request, call_next):
+    """HTTP middleware: observe latency labelled with the matched route template."""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        REQUEST_SECONDS.labels(request.method, path, str(status)).observe(time.perf_counter() - start)
@@ -1,19 +1,103 @@
 # backend/notification.py
 
+import asyncio
 import os
 import httpx
+from collections import Counter
 from datetime import datetime
 from dotenv import load_dotenv
+from backend.metrics import NOTIFICATION_PUSHES_SAVED
+from backend.onesignal import client as onesignal
 
 load_dotenv()
 
 ONESIGNAL_APP_ID = os.getenv("ONESIGNAL_APP_ID")
 ONESIGNAL_REST_KEY = os.getenv("ONESIGNAL_REST_API_KEY")
-ONESIGNAL_URL = "https://onesignal.com/api/v1/notifications"
+
+# Per level: the first alert is pushed at once, then for this many seconds
+# the user's further alerts are gathered into one digest push;
+# levels not listed (CRITICAL, HIGH) are always sent immediately
+DIGEST_WINDOWS = {
+    level: float(seconds)
+    for level, _, seconds in (
+        item.partition("=") for item in os.getenv("DIGEST_WINDOWS", "MEDIUM=120,LOW=600").split(",") if item
+    )
+}
 
 print(f"✅ OneSignal configured: {ONESIGNAL_APP_ID[:8] if ONESIGNAL_APP_ID else '❌ Missing'}...")
 
 
+ANIMAL_EMOJI = {
+    "tiger": "🐅",
+    "bear": "🐻",
+    "elephant": "🐘",
+    "boar": "🐗",
+    "human": "👤"
+}
+
+# ALL levels need channel_id
+ALERT_CONFIG = {
+    "CRITICAL": {
+        "emoji": "🚨",
+        "channel_id": "2fe37f53-0fc7-4e4f-94c0-8dac5edd28de"
+    },
+    "HIGH": {
+        "emoji": "🔴",
+        "channel_id": "2fe37f53-0fc7-4e4f-94c0-8dac5edd28de"
+    },
+    "MEDIUM": {
+        "emoji": "🟡",
+        "channel_id": "2fe37f53-0fc7-4e4f-94c0-8dac5edd28de"
+    },
+    "LOW": {
+        "emoji": "🟢",
+        "channel_id": "2fe37f53-0fc7-4e4f-94c0-8dac5edd28de"  # ← FIXED: Added channel_id
+    }
+}
+
+LEVEL_ORDER = ["LOW", "MEDIUM", "HIGH", "CRITICAL"]
+
+
+def _headers():
+    return {
+        "Authorization": f"Basic {ONESIGNAL_REST_KEY}",
+        "Content-Type": "application/json",
+    }
+
+
+def _target(payload, player_ids):
+    if player_ids and len(player_ids) > 0:
+        payload["include_player_ids"] = player_ids
+        print(f"📤 Sending to {len(player_ids)} device(s)")
+    else:
+        payload["included_segments"] = ["All"]
+        print(f"📤 Sending to all users")
+
+
+async def _send(payload):
+    """
+    POST a notification on the pooled client and return OneSignal's response.
+    Errors are raised (after the client's own retries) so the dispatcher can
+    tell a rejected request from an unavailable provider.
+    """
+    try:
+        result = await onesignal.post(payload, _headers())
+    except httpx.HTTPStatusError as e:
+        print(f"❌ HTTP Error {e.response.status_code}: {e.response.text}")
+        raise
+    except Exception as e:
+        print(f"❌ Error: {type(e).__name__}: {e}")
+        raise
+
+    recipients = result.get("recipients", 0)
+    print(f"✅ Sent! Recipients: {recipients}")
+
+    if recipients == 0:
+        print("⚠️ No recipients - check if app is subscribed")
+
+    return result
+
+
 async def send_animal_alert(
     animal_type: str,
     image_url: str,
@@ -24,41 +108,8 @@ async def send_animal_alert(
     """
     Send wildlife detection alert via OneSignal
     """
-    animal_emoji = {
-        "tiger": "🐅",
-        "bear": "🐻",
-        "elephant": "🐘",
-        "boar": "🐗",
-        "human": "👤"
-    }
-    
-    # ALL levels need channel_id
-    alert_config = {
-        "CRITICAL": {
-            "emoji": "🚨",
-            "channel_id": "2fe37f53-0fc7-4e4f-94c0-8dac5edd28de"
-        },
-        "HIGH": {
-            "emoji": "🔴",
-            "channel_id": "2fe37f53-0fc7-4e4f-94c0-8dac5edd28de"
-        },
-        "MEDIUM": {
-            "emoji": "🟡",
-            "channel_id": "2fe37f53-0fc7-4e4f-94c0-8dac5edd28de"
-        },
-        "LOW": {
-            "emoji": "🟢",
-            "channel_id": "2fe37f53-0fc7-4e4f-94c0-8dac5edd28de"  # ← FIXED: Added channel_id
-        }
-    }
-    
-    config = alert_config.get(alert_level, alert_config["MEDIUM"])
-    emoji = animal_emoji.get(animal_type.lower(), "🦁")
-    
-    headers = {
-        "Authorization": f"Basic {ONESIGNAL_REST_KEY}",
-        "Content-Type": "application/json",
-    }
+    config = ALERT_CONFIG.get(alert_level, ALERT_CONFIG["MEDIUM"])
+    emoji = ANIMAL_EMOJI.get(animal_type.lower(), "🦁")
     
     payload = {
         "app_id": ONESIGNAL_APP_ID,
@@ -76,36 +127,158 @@ async def send_animal_alert(
         "priority": 10,
         "android_channel_id": config["channel_id"],
     }
-    
-    if player_ids and len(player_ids) > 0:
-        payload["include_player_ids"] = player_ids
-        print(f"📤 Sending to {len(player_ids)} device(s)")
-    else:
-        payload["included_segments"] = ["All"]
-        print(f"📤 Sending to all users")
+    _target(payload, player_ids)
     
     print(f"   {animal_type} | {alert_level} | Channel: {config['channel_id'][:8]}...")
+    return await _send(payload)
+
+
+def digest_text(animal_counts: dict, window: str = None) -> str:
+    """e.g. "🐗 3 boar, 🐘 1 elephant in last 2 min" (most frequent first)."""
+    parts = [
+        f"{ANIMAL_EMOJI.get(animal.lower(), '🦁')} {count} {animal}"
+        for animal, count in sorted(animal_counts.items(), key=lambda item: -item[1])
+    ]
+    text = ", ".join(parts)
+    return f"{text} in last {window}" if window else text
+
+
+async def send_alert_digest(
+    animal_counts: dict,
+    alert_level: str = "MEDIUM",
+    image_url: str = None,
+    location: str = "Unknown",
+    player_ids: list = None,
+    window: str = None
+):
+    """
+    One push summarising several alerts, e.g. a drained backlog or a herd
+    """
+    config = ALERT_CONFIG.get(alert_level, ALERT_CONFIG["MEDIUM"])
+    total = sum(animal_counts.values())
     
-    try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            response = await client.post(ONESIGNAL_URL, json=payload, headers=headers)
-            response.raise_for_status()
-            result = response.json()
-            
-            recipients = result.get("recipients", 0)
-            print(f"✅ Sent! Recipients: {recipients}")
-            
-            if recipients == 0:
-                print("⚠️ No recipients - check if app is subscribed")
-            
-            return result
-            
-    except httpx.HTTPStatusError as e:
-        print(f"❌ HTTP Error {e.response.status_code}: {e.response.text}")
-        return None
-    except Exception as e:
-        print(f"❌ Error: {type(e).__name__}: {e}")
-        return None
+    payload = {
+        "app_id": ONESIGNAL_APP_ID,
+        "headings": {"en": f"{config['emoji']} {total} Wildlife Alerts"},
+        "contents": {"en": f"{digest_text(animal_counts, window)} at {location}"},
+        "data": {
+            "animal_counts": animal_counts,
+            "image_url": image_url,
+            "alert_level": alert_level,
+            "location": location,
+            "timestamp": datetime.now().isoformat()
+        },
+        "priority": 10,
+        "android_channel_id": config["channel_id"],
+    }
+    if image_url:
+        payload["big_picture"] = image_url
+        payload["large_icon"] = image_url
+    _target(payload, player_ids)
+    
+    print(f"   digest of {total} | {alert_level} | Channel: {config['channel_id'][:8]}...")
+    return await _send(payload)
+
+
+def _window_text(seconds: float) -> str:
+    return f"{seconds / 60:g} min" if seconds >= 60 else f"{seconds:g}s"
+
+
+class NotificationCoalescer:
+    """
+    Groups a user's alerts per level inside that level's digest window.
+    The first alert is pushed straight away and opens the window; the
+    follow-ups gathered while it is open go out as one push when it closes
+    ("3 boar, 1 elephant in last 2 min"). Levels without a window are
+    always handed to `submit` straight away.
+    `submit(alert_ids, send=..., **kwargs)` is NotificationDispatcher.submit.
+    """
+
+    def __init__(self, submit, windows=None):
+        self.submit = submit
+        self.windows = DIGEST_WINDOWS if windows is None else windows
+        self._groups = {}  # (user_id, level) -> pending digest
+        self.received = 0
+        self.pushes = 0
+
+    @property
+    def saved(self):
+        return self.received - self.pushes - sum(len(g["alert_ids"]) for g in self._groups.values())
+
+    async def add(self, user_id, alert_id, animal_type, image_url, alert_level, location, player_ids):
+        self.received += 1
+        window = self.windows.get(alert_level, 0)
+        key = (user_id, alert_level)
+        group = self._groups.get(key)
+        if group is None:
+            if window > 0:
+                # Later alerts of this level wait for the digest; this one does not
+                self._groups[key] = {
+                    "alert_ids": [],
+                    "animals": Counter(),
+                    "image_url": None,
+                    "window": window,
+                    "task": asyncio.create_task(self._close_after(key, window)),
+                }
+            self.pushes += 1
+            return await self.submit(
+                alert_id,
+                animal_type=animal_type,
+                image_url=image_url,
+                alert_level=alert_level,
+                location=location,
+                player_ids=player_ids,
+            )
+
+        group["alert_ids"].append(alert_id)
+        group["animals"][animal_type] += 1
+        group["image_url"] = image_url or group["image_url"]
+        group["location"] = location
+        group["player_ids"] = player_ids
+        return True
+
+    async def _close_after(self, key, window):
+        await asyncio.sleep(window)
+        await self._flush(key)
+
+    async def _flush(self, key):
+        group = self._groups.pop(key, None)
+        if group is None or not group["alert_ids"]:
+            return  # nothing followed the alert that opened the window
+        self.pushes += 1
+        _, alert_level = key
+        alert_ids = group["alert_ids"]
+        if len(alert_ids) == 1:
+            animal_type = next(iter(group["animals"]))
+            await self.submit(
+                alert_ids,
+                animal_type=animal_type,
+                image_url=group["image_url"],
+                alert_level=alert_level,
+                location=group["location"],
+                player_ids=group["player_ids"],
+            )
+            return
+
+        NOTIFICATION_PUSHES_SAVED.inc(len(alert_ids) - 1)
+        print(f"📦 Digest of {len(alert_ids)} {alert_level} alerts in one push "
+              f"({len(alert_ids) - 1} saved, {self.saved} this run)")
+        await self.submit(
+            alert_ids,
+            send=send_alert_digest,
+            animal_counts=dict(group["animals"]),
+            alert_level=alert_level,
+            image_url=group["image_url"],
+            location=group["location"],
+            player_ids=group["player_ids"],
+            window=_window_text(group["window"]),
+        )
+
+    async def flush_all(self):
+        """Send every open digest now (at shutdown)."""
+        for key, group in list(self._groups.items()):
+            group["task"].cancel()
+            await self._flush(key)
 
 
 # Legacy function
@@ -114,11 +287,6 @@ async def send_onesignal_notification(player_ids, heading, message, data=None, u
     if not player_ids:
         player_ids = None
     
-    headers = {
-        "Authorization": f"Basic {ONESIGNAL_REST_KEY}",
-        "Content-Type": "application/json",
-    }
-    
     payload = {
         "app_id": ONESIGNAL_APP_ID,
         "headings": {"en": heading},
@@ -138,7 +306,4 @@ async def send_onesignal_notification(player_ids, heading, message, data=None, u
     if url:
         payload["url"] = url
     
-    async with httpx.AsyncClient(timeout=10) as client:
-        response = await client.post(ONESIGNAL_URL, json=payload, headers=headers)
-        response.raise_for_status()
-        return response.json()
+    return await onesignal.post(payload, _headers())
@@ -0,0 +1,193 @@
+# backend/onesignal.py
+import asyncio
+import importlib.util
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from backend.metrics import ONESIGNAL_CIRCUIT, ONESIGNAL_REQUESTS, ONESIGNAL_SECONDS
+
+ONESIGNAL_URL = os.getenv("ONESIGNAL_API_URL", "https://onesignal.com/api/v1/notifications")
+
+# Worth retrying: rate limited or the provider is having trouble
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """OneSignal failed repeatedly; calls fail fast until the breaker half-opens."""
+
+    def __init__(self, message, retry_after=0.0):
+        super().__init__(message)
+        self.retry_after = retry_after  # seconds until a trial call is allowed
+
+
+def is_permanent(error):
+    """True when retrying cannot help: OneSignal rejected the request itself (4xx other than 429)."""
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code not in RETRY_STATUSES
+
+
+class OneSignalClient:
+    """
+    One pooled httpx.AsyncClient for every OneSignal call (keep-alive,
+    optional HTTP/2), opened and closed with the FastAPI app lifespan.
+    At most `concurrency` requests are in flight. 429/5xx and network
+    errors are retried with jittered exponential backoff, waiting at least
+    as long as Retry-After asks. After `failure_threshold` failed calls in
+    a row the circuit opens and calls fail fast for `reset_timeout`
+    seconds; then one trial call decides whether it closes again.
+    """
+
+    def __init__(self, url=ONESIGNAL_URL, timeout=10.0, concurrency=8, max_retries=3,
+                 base_delay=0.5, max_delay=10.0, failure_threshold=5, reset_timeout=30.0, http2=False):
+        self.url = url
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        # HTTP/2 needs the optional h2 package
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+
+        self._client = None
+        self._limiter = None
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    async def start(self, transport=None):
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            http2=self.http2,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            transport=transport,
+        )
+        self._limiter = asyncio.Semaphore(self.concurrency)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # --- circuit breaker ---
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    @property
+    def retry_after(self):
+        """Seconds until the breaker lets a trial call through (0 when closed)."""
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def _before_call(self):
+        state = self.state
+        if state == "open" or (state == "half-open" and self._trial_running):
+            ONESIGNAL_REQUESTS.labels("circuit_open").inc()
+            raise CircuitOpenError(f"OneSignal circuit open after {self._failures} failure(s)",
+                                   retry_after=self.retry_after or 1.0)
+        self._trial_running = state == "half-open"
+
+    def _record(self, ok):
+        self._trial_running = False
+        if ok:
+            self._failures = 0
+            self._opened_at = None
+            ONESIGNAL_CIRCUIT.set(0)
+            return
+        self._failures += 1
+        if self._failures >= self.failure_threshold or self._opened_at is not None:
+            if self._opened_at is None:
+                print(f"⚠️ OneSignal circuit opened after {self._failures} failures")
+            self._opened_at = time.monotonic()
+            ONESIGNAL_CIRCUIT.set(1)
+
+    # --- requests ---
+
+    def _retry_delay(self, attempt, response=None):
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                wait = float(retry_after)
+            except ValueError:
+                try:
+                    wait = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    wait = 0.0
+            delay = max(delay, min(wait, self.max_delay * 6))
+        return delay
+
+    async def _post_once(self, payload, headers):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            async with self._limiter:
+                response = await self._client.post(self.url, json=payload, headers=headers)
+            outcome = str(response.status_code)
+            return response
+        finally:
+            ONESIGNAL_SECONDS.labels(outcome).observe(time.perf_counter() - start)
+            ONESIGNAL_REQUESTS.labels(outcome).inc()
+
+    async def post(self, payload, headers):
+        """
+        POST one notification and return OneSignal's JSON.
+        Raises httpx.HTTPStatusError for rejected requests, the last error
+        once retries are used up, or CircuitOpenError while the breaker is open.
+        """
+        if self._client is None:
+            await self.start()
+        self._before_call()
+        try:
+            result = await self._post_with_retries(payload, headers)
+        except httpx.HTTPStatusError as e:
+            # 4xx: our request is wrong, the provider is fine
+            self._record(ok=is_permanent(e))
+            raise
+        except Exception:
+            self._record(ok=False)
+            raise
+        finally:
+            # Whatever happened (even cancellation), a half-open trial is over
+            self._trial_running = False
+        self._record(ok=True)
+        return result
+
+    async def _post_with_retries(self, payload, headers):
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = await self._post_once(payload, headers)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response.json()
+                error = httpx.HTTPStatusError(
+                    f"OneSignal returned {response.status_code}", request=response.request, response=response)
+            except httpx.RequestError as e:
+                error = e
+
+            if attempt >= self.max_retries:
+                raise error
+            delay = self._retry_delay(attempt, response)
+            attempt += 1
+            print(f"⚠️ OneSignal attempt {attempt} failed ({error}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+client = OneSignalClient(
+    concurrency=int(os.getenv("ONESIGNAL_CONCURRENCY", "8")),
+    http2=os.getenv("ONESIGNAL_HTTP2", "").lower() in ("1", "true", "yes"),
+)
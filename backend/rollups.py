@@ -0,0 +1,183 @@
+# backend/rollups.py
+"""
+Pre-aggregated alert statistics.
+
+One document per user per (UTC) day holds the alert total and counts by
+animal, level and hour of day. create_alert / the batch endpoint /
+delete_alert keep it current with $inc upserts, so GET /alerts/stats reads
+at most one small document per day instead of scanning raw alerts.
+
+    python -m backend.rollups rebuild [--user USER_ID]   # recompute from raw (and archived) alerts
+    python -m backend.rollups archive --days 90          # move old raw alerts to alerts_archive
+"""
+import argparse
+import asyncio
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from pymongo import ReplaceOne, UpdateOne
+
+from backend.database import alerts_archive_collection, alerts_collection, rollups_collection
+
+ALERT_RETENTION_DAYS = int(os.getenv("ALERT_RETENTION_DAYS", "0"))  # 0 keeps raw alerts forever
+ARCHIVE_BATCH_SIZE = 1000
+
+
+def _key(value: str) -> str:
+    # Mongo field names cannot contain "." or start with "$"
+    return str(value).replace(".", "_").replace("$", "_")
+
+
+def _day(timestamp: datetime) -> datetime:
+    return datetime(timestamp.year, timestamp.month, timestamp.day)
+
+
+def _rollup_update(alert: dict, sign: int = 1) -> UpdateOne:
+    day = _day(alert["timestamp"])
+    user_id = alert["user_id"]
+    return UpdateOne(
+        {"_id": f"{user_id}:{day.date().isoformat()}"},
+        {
+            "$setOnInsert": {"user_id": user_id, "day": day},
+            "$inc": {
+                "total": sign,
+                f"by_animal.{_key(alert['animal'])}": sign,
+                f"by_level.{_key(alert.get('alert_level', 'MEDIUM'))}": sign,
+                f"by_hour.{alert['timestamp'].hour:02d}": sign,
+            },
+        },
+        upsert=True,
+    )
+
+
+async def record_alerts(alerts: list, sign: int = 1):
+    """Add (or with sign=-1 remove) stored alerts to their daily rollups."""
+    if alerts:
+        await rollups_collection.bulk_write([_rollup_update(alert, sign) for alert in alerts], ordered=False)
+
+
+async def get_stats(user_id: str, since: datetime, until: datetime) -> dict:
+    """Sum the daily rollups of `user_id` for the days in [since, until]."""
+    stats = {
+        "since": _day(since),
+        "until": _day(until),
+        "total": 0,
+        "by_animal": defaultdict(int),
+        "by_level": defaultdict(int),
+        "by_hour": [0] * 24,
+        "by_day": {},
+    }
+    cursor = rollups_collection.find(
+        {"user_id": user_id, "day": {"$gte": _day(since), "$lte": _day(until)}}
+    ).sort("day", 1)
+    async for rollup in cursor:
+        stats["total"] += rollup.get("total", 0)
+        stats["by_day"][rollup["day"].date().isoformat()] = rollup.get("total", 0)
+        for animal, count in rollup.get("by_animal", {}).items():
+            stats["by_animal"][animal] += count
+        for level, count in rollup.get("by_level", {}).items():
+            stats["by_level"][level] += count
+        for hour, count in rollup.get("by_hour", {}).items():
+            stats["by_hour"][int(hour)] += count
+    # Zero counts left behind by deletions are noise
+    stats["by_animal"] = {k: v for k, v in stats["by_animal"].items() if v}
+    stats["by_level"] = {k: v for k, v in stats["by_level"].items() if v}
+    return stats
+
+
+async def rebuild(user_id: str = None) -> int:
+    """Recompute rollups from raw and archived alerts. Returns the number of rollup documents."""
+    match = {"user_id": user_id} if user_id else {}
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "user_id": "$user_id",
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+                "hour": {"$hour": "$timestamp"},
+                "animal": "$animal",
+                "level": {"$ifNull": ["$alert_level", "MEDIUM"]},
+            },
+            "count": {"$sum": 1},
+        }},
+    ]
+    rollups = {}
+    for collection in (alerts_collection, alerts_archive_collection):
+        async for group in collection.aggregate(pipeline):
+            g = group["_id"]
+            rollup_id = f"{g['user_id']}:{g['day']}"
+            rollup = rollups.setdefault(rollup_id, {
+                "_id": rollup_id,
+                "user_id": g["user_id"],
+                "day": datetime.fromisoformat(g["day"]),
+                "total": 0,
+                "by_animal": defaultdict(int),
+                "by_level": defaultdict(int),
+                "by_hour": defaultdict(int),
+            })
+            rollup["total"] += group["count"]
+            rollup["by_animal"][_key(g["animal"])] += group["count"]
+            rollup["by_level"][_key(g["level"])] += group["count"]
+            rollup["by_hour"][f"{g['hour']:02d}"] += group["count"]
+
+    await rollups_collection.delete_many(match)
+    if rollups:
+        await rollups_collection.bulk_write(
+            [ReplaceOne({"_id": r["_id"]}, {**r, "by_animal": dict(r["by_animal"]),
+                                            "by_level": dict(r["by_level"]), "by_hour": dict(r["by_hour"])},
+                        upsert=True)
+             for r in rollups.values()],
+            ordered=False,
+        )
+    return len(rollups)
+
+
+async def archive_older_than(days: int) -> int:
+    """Move raw alerts older than `days` to alerts_archive. Rollups keep counting them."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    moved = 0
+    while True:
+        batch = await alerts_collection.find({"timestamp": {"$lt": cutoff}}).limit(ARCHIVE_BATCH_SIZE).to_list(
+            length=ARCHIVE_BATCH_SIZE)
+        if not batch:
+            return moved
+        # Insert before delete: a crash in between leaves a duplicate, never a loss
+        await alerts_archive_collection.bulk_write(
+            [ReplaceOne({"_id": alert["_id"]}, alert, upsert=True) for alert in batch], ordered=False
+        )
+        await alerts_collection.delete_many({"_id": {"$in": [alert["_id"] for alert in batch]}})
+        moved += len(batch)
+
+
+async def retention_loop(days: int, interval: float = 24 * 3600):
+    """Archive old alerts once a day while the app runs."""
+    while True:
+        try:
+            moved = await archive_older_than(days)
+            if moved:
+                print(f"🗄️ Archived {moved} alert(s) older than {days} days")
+        except Exception as e:
+            print(f"⚠️ Alert archiving failed: {e}")
+        await asyncio.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain alert statistics rollups")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = sub.add_parser("rebuild", help="Recompute rollups from raw and archived alerts")
+    rebuild_parser.add_argument("--user", help="Only this user id")
+    archive_parser = sub.add_parser("archive", help="Move old raw alerts to alerts_archive")
+    archive_parser.add_argument("--days", type=int, default=ALERT_RETENTION_DAYS or 90)
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        count = asyncio.run(rebuild(args.user))
+        print(f"✅ Rebuilt {count} rollup document(s)")
+    else:
+        moved = asyncio.run(archive_older_than(args.days))
+        print(f"🗄️ Archived {moved} alert(s) older than {args.days} days")
+
+
+if __name__ == "__main__":
+    main()
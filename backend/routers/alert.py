@@ -1,15 +1,31 @@
 # backend/routers/alert.py
 
-from fastapi import APIRouter, Depends
-from datetime import datetime
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+import asyncio
+import base64
+import json
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, List, Optional
+from pydantic import ValidationError
 from backend.schemas import AlertOut, AlertCreate
-from backend.database import alerts_collection, users_collection
+from backend.database import alerts_collection
 from backend.deps import get_current_user
-from backend.notification import send_animal_alert  # ← Use new function
+from backend.dispatch import coalescer, dispatcher
+from backend.notification import LEVEL_ORDER, send_alert_digest
+from backend.rollups import get_stats, record_alerts
+from backend.stream import broker
 from bson import ObjectId
+from bson.errors import InvalidId
 
 router = APIRouter(prefix="/alerts", tags=["alerts"])
 
+MAX_BATCH_SIZE = 500
+STREAM_HEARTBEAT = 15   # Seconds between keep-alive comments on idle streams
+STREAM_REPLAY_LIMIT = 500  # Most alerts replayed to a resuming client
+
 
 def determine_alert_level(animal: str) -> str:
     """
@@ -25,97 +41,326 @@ def determine_alert_level(animal: str) -> str:
     return alert_mapping.get(animal.lower(), "MEDIUM")
 
 
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Stored timestamps are naive UTC; clients may send an offset ("...Z")
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def detected_at(alert: AlertCreate, now: datetime) -> datetime:
+    """
+    The alert's own detection time (outbox deliveries can be hours late),
+    capped at `now`; alerts without one are stamped `now`.
+    """
+    return min(_naive_utc(alert.timestamp) or now, now)
+
+
+def new_alert_doc(alert: AlertCreate, user_id: str, timestamp: datetime) -> dict:
+    return {
+        "user_id": user_id,
+        "animal": alert.animal,
+        "image_url": alert.image_url,
+        "clip_url": alert.clip_url,
+        "alert_level": determine_alert_level(alert.animal),
+        "timestamp": timestamp,
+        "notification": {"status": "queued", "attempts": 0},
+    }
+
+
 @router.post("/", response_model=AlertOut)
 async def create_alert(
     alert: AlertCreate, 
     current_user: dict = Depends(get_current_user)
 ):
     """
-    Create new wildlife alert and send OneSignal notification
+    Create new wildlife alert; the OneSignal notification is sent in the background
     """
-    # Determine alert level based on animal type
-    alert_level = determine_alert_level(alert.animal)
-    
-    # Create alert document
-    new_alert = {
-        "user_id": current_user["id"],
-        "animal": alert.animal,
-        "image_url": alert.image_url,
-        "alert_level": alert_level,  # ← Add alert level
-        "timestamp": datetime.utcnow()
-    }
+    # Create alert document (level is based on animal type)
+    new_alert = new_alert_doc(alert, current_user["id"], detected_at(alert, datetime.utcnow()))
+    alert_level = new_alert["alert_level"]
     
     # Save to MongoDB
     result = await alerts_collection.insert_one(new_alert)
     alert_id = str(result.inserted_id)
+    await _record_rollups([new_alert])
+    broker.publish(current_user["id"], alert_out(new_alert))
     
     print(f"📥 Alert created: {alert.animal} ({alert_level}) - ID: {alert_id}")
     
-    # Get user's player IDs for targeted notification
-    try:
-        user_doc = await users_collection.find_one({"_id": ObjectId(current_user["id"])})
-        player_ids = user_doc.get("player_ids", []) if user_doc else []
-    except Exception as e:
-        print(f"⚠️ Failed to get player_ids: {e}")
-        player_ids = []
+    # player_ids come with the (cached) user document; /users/player invalidates it
+    player_ids = current_user.get("player_ids") or None
     
-    # Send OneSignal notification with custom sound
-    try:
-        if player_ids:
-            # Send to specific user
-            print(f"📤 Sending notification to {len(player_ids)} device(s)")
-            notification_result = await send_animal_alert(
-                animal_type=alert.animal,
-                image_url=alert.image_url,
-                alert_level=alert_level,
-                location="Your Farm",
-                player_ids=player_ids  # ← Specific users
+    # Hand the push to the dispatcher (lower levels via a digest window);
+    # the detector does not wait for OneSignal
+    await coalescer.add(
+        current_user["id"],
+        alert_id,
+        animal_type=alert.animal,
+        image_url=alert.image_url,
+        alert_level=alert_level,
+        location="Your Farm" if player_ids else "Farm Camera",
+        player_ids=player_ids,  # ← None = all users
+    )
+    
+    return {**new_alert, "id": alert_id}
+
+
+@router.post("/batch")
+async def create_alerts_batch(
+    items: List[Any] = Body(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Store many alerts at once (e.g. a detector outbox draining after an outage)
+    with a single insert_many, and send one collapsed notification for them.
+    Items may carry their detection `timestamp`; it is capped at the current time.
+    """
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} alerts per batch")
+    
+    # Validate every item in one pass; invalid ones are reported, not fatal
+    results = [None] * len(items)
+    docs, positions = [], []
+    now = datetime.utcnow()
+    for index, item in enumerate(items):
+        try:
+            alert = AlertCreate.model_validate(item)
+        except ValidationError as e:
+            results[index] = {"index": index, "ok": False, "error": str(e)}
+            continue
+        docs.append(new_alert_doc(alert, current_user["id"], detected_at(alert, now)))
+        positions.append(index)
+    
+    alert_ids = []
+    if docs:
+        result = await alerts_collection.insert_many(docs, ordered=True)
+        alert_ids = [str(_id) for _id in result.inserted_ids]
+        await _record_rollups(docs)
+        for doc in docs:
+            broker.publish(current_user["id"], alert_out(doc))
+        for index, doc, alert_id in zip(positions, docs, alert_ids):
+            results[index] = {"index": index, "ok": True, "id": alert_id, "alert_level": doc["alert_level"]}
+    
+    print(f"📥 Batch of {len(items)}: {len(alert_ids)} alert(s) created, {len(items) - len(alert_ids)} rejected")
+    
+    if alert_ids:
+        player_ids = current_user.get("player_ids") or None
+        location = "Your Farm" if player_ids else "Farm Camera"
+        if len(docs) == 1:
+            await dispatcher.submit(
+                alert_ids,
+                animal_type=docs[0]["animal"],
+                image_url=docs[0]["image_url"],
+                alert_level=docs[0]["alert_level"],
+                location=location,
+                player_ids=player_ids,
             )
         else:
-            # Fallback: send to all users (if no player_ids registered)
-            print(f"📤 No player_ids found, sending to all users")
-            notification_result = await send_animal_alert(
-                animal_type=alert.animal,
-                image_url=alert.image_url,
-                alert_level=alert_level,
-                location="Farm Camera",
-                player_ids=None  # ← None = all users
+            # One push for the whole batch, at the most severe level in it
+            await dispatcher.submit(
+                alert_ids,
+                send=send_alert_digest,
+                animal_counts=dict(Counter(doc["animal"] for doc in docs)),
+                alert_level=max((doc["alert_level"] for doc in docs), key=LEVEL_ORDER.index),
+                image_url=next((doc["image_url"] for doc in reversed(docs) if doc["image_url"]), None),
+                location=location,
+                player_ids=player_ids,
             )
-        
-        if notification_result:
-            print(f"✅ OneSignal notification sent successfully")
-        else:
-            print(f"⚠️ OneSignal notification returned no result")
-            
-    except Exception as e:
-        print(f"❌ OneSignal notification failed: {e}")
-        # Don't fail the request if notification fails
     
-    return {**new_alert, "id": alert_id}
+    return {"created": len(alert_ids), "rejected": len(items) - len(alert_ids), "results": results}
+
+
+@router.get("/{alert_id}/notification")
+async def get_notification_status(
+    alert_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Delivery status of an alert's push notification
+    """
+    try:
+        alert = await alerts_collection.find_one(
+            {"_id": ObjectId(alert_id), "user_id": current_user["id"]},
+            {"notification": 1},
+        )
+    except InvalidId:
+        alert = None
+    if alert is None:
+        raise HTTPException(status_code=404, detail="Alert not found")
+    return {"id": alert_id, "notification": alert.get("notification", {"status": "unknown"})}
+
+
+def alert_out(alert: dict) -> dict:
+    """API shape of a stored alert document."""
+    return {
+        "id": str(alert["_id"]),
+        "user_id": alert["user_id"],
+        "animal": alert["animal"],
+        "image_url": alert.get("image_url"),
+        "clip_url": alert.get("clip_url"),
+        "alert_level": alert.get("alert_level", "MEDIUM"),  # ← Include alert level
+        "timestamp": alert["timestamp"]
+    }
+
+
+async def _record_rollups(alerts, sign=1):
+    # Stats are derived data (see `python -m backend.rollups rebuild`); never fail the request over them
+    try:
+        await record_alerts(alerts, sign)
+    except Exception as e:
+        print(f"⚠️ Rollup update failed: {e}")
+
+
+def encode_cursor(alert: dict) -> str:
+    raw = f"{alert['timestamp'].isoformat()}|{alert['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        timestamp, alert_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), ObjectId(alert_id)
+    except (ValueError, InvalidId, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# Fields the alert list needs; notification details stay out of the payload
+ALERT_LIST_PROJECTION = {
+    "user_id": 1,
+    "animal": 1,
+    "image_url": 1,
+    "clip_url": 1,
+    "alert_level": 1,
+    "timestamp": 1,
+}
 
 
 @router.get("/me")
-async def get_my_alerts(current_user: dict = Depends(get_current_user)):
+async def get_my_alerts(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    animal: Optional[str] = None,
+    alert_level: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    current_user: dict = Depends(get_current_user)
+):
     """
-    Get all alerts for the current user
+    Get the current user's alerts, newest first, one page at a time.
+    Pass the returned next_cursor to get the following page.
+    Served by the (user_id, timestamp, _id) index created at startup.
     """
-    cursor = alerts_collection.find({"user_id": str(current_user["id"])})
-    alerts = []
+    query = {"user_id": str(current_user["id"])}
+    if animal:
+        query["animal"] = animal
+    if alert_level:
+        query["alert_level"] = alert_level.upper()
+    if since or until:
+        query["timestamp"] = {}
+        if since:
+            query["timestamp"]["$gte"] = since
+        if until:
+            query["timestamp"]["$lt"] = until
+    if cursor:
+        # Keyset: strictly after the last alert of the previous page
+        last_timestamp, last_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"timestamp": {"$lt": last_timestamp}},
+            {"timestamp": last_timestamp, "_id": {"$lt": last_id}},
+        ]
     
-    async for alert in cursor:
-        alerts.append({
-            "id": str(alert["_id"]),
-            "user_id": alert["user_id"],
-            "animal": alert["animal"],
-            "image_url": alert.get("image_url"),
-            "alert_level": alert.get("alert_level", "MEDIUM"),  # ← Include alert level
-            "timestamp": alert["timestamp"]
-        })
+    docs = await (
+        alerts_collection.find(query, ALERT_LIST_PROJECTION)
+        .sort([("timestamp", -1), ("_id", -1)])
+        .limit(limit + 1)
+        .to_list(length=limit + 1)
+    )
+    has_more = len(docs) > limit
+    docs = docs[:limit]
     
-    # Sort by timestamp, newest first
-    alerts.sort(key=lambda x: x["timestamp"], reverse=True)
+    alerts = [alert_out(alert) for alert in docs]
     
-    return {"alerts": alerts}
+    return {
+        "alerts": alerts,
+        "has_more": has_more,
+        "next_cursor": encode_cursor(docs[-1]) if has_more else None,
+    }
+
+
+def _sse(alert: dict) -> str:
+    return f"id: {alert['id']}\nevent: alert\ndata: {json.dumps(jsonable_encoder(alert))}\n\n"
+
+
+@router.get("/stream")
+async def stream_alerts(
+    request: Request,
+    last_id: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Server-Sent Events stream of the current user's new alerts.
+    Reconnect with Last-Event-ID (or ?last_id=) to get what was missed first.
+    """
+    user_id = current_user["id"]
+    resume_from = last_id or last_event_id
+    try:
+        resume_oid = ObjectId(resume_from) if resume_from else None
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid last_id")
+    
+    async def events():
+        # Subscribe before replaying so nothing falls between the two
+        subscription = broker.subscribe(user_id)
+        last_sent = resume_oid
+        try:
+            yield "retry: 3000\n\n"
+            if resume_oid is not None:
+                missed = (
+                    alerts_collection.find({"user_id": user_id, "_id": {"$gt": resume_oid}}, ALERT_LIST_PROJECTION)
+                    .sort("_id", 1)
+                    .limit(STREAM_REPLAY_LIMIT)
+                )
+                async for alert in missed:
+                    last_sent = alert["_id"]
+                    yield _sse(alert_out(alert))
+            
+            while not await request.is_disconnected():
+                try:
+                    alert = await asyncio.wait_for(subscription.get(), STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if alert is None:
+                    break  # buffer overflowed; the client reconnects with its last id
+                if last_sent is not None and ObjectId(alert["id"]) <= last_sent:
+                    continue  # already sent during the replay
+                yield _sse(alert)
+        finally:
+            broker.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/stats")
+async def get_alert_stats(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Alert counts by animal, level, hour of day (UTC) and day, from the daily rollups
+    """
+    until = _naive_utc(until) or datetime.utcnow()
+    since = _naive_utc(since) or until - timedelta(days=30)
+    if since > until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    return await get_stats(current_user["id"], since, until)
 
 
 @router.delete("/{alert_id}")
@@ -127,13 +372,17 @@ async def delete_alert(
     Delete a specific alert (optional endpoint)
     """
     try:
-        result = await alerts_collection.delete_one({
-            "_id": ObjectId(alert_id),
-            "user_id": current_user["id"]  # Ensure user owns the alert
-        })
+        deleted = await alerts_collection.find_one_and_delete(
+            {
+                "_id": ObjectId(alert_id),
+                "user_id": current_user["id"]  # Ensure user owns the alert
+            },
+            projection={"user_id": 1, "animal": 1, "alert_level": 1, "timestamp": 1},
+        )
         
-        if result.deleted_count == 0:
+        if deleted is None:
             return {"success": False, "message": "Alert not found or unauthorized"}
+        await _record_rollups([deleted], sign=-1)
         
         return {"success": True, "message": "Alert deleted"}
         
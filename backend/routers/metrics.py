@@ -0,0 +1,11 @@
+# backend/routers/metrics.py
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics")
+def metrics():
+    """Prometheus text format scrape endpoint."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,11 +1,60 @@
 # backend/routers/server.py
-import subprocess, os
+import asyncio, subprocess, os
 from fastapi import APIRouter, Depends, Request
 from backend.deps import get_current_user
+from detector.framebus import FrameBus
 
 router = APIRouter(prefix="/server", tags=["server"])
 camera_process = None  # track camera subprocess
 process = None  # track subprocess
+bus_process = None  # track the frame bus publisher both of them read from
+
+# The detector and the camera stream share one camera through a frame bus;
+# FRAME_BUS_NAME=off lets each of them open CAMERA_SOURCES itself instead
+FRAME_BUS_NAME = os.getenv("FRAME_BUS_NAME", "wildcam")
+FRAME_BUS_SOURCE = os.getenv("FRAME_BUS_SOURCE", "0")
+FRAME_BUS_TIMEOUT = 10  # Seconds to wait for the publisher to open the camera
+
+
+def _frame_bus_enabled():
+    return FRAME_BUS_NAME.lower() != "off"
+
+
+async def _start_frame_bus(python_path):
+    """Start the single camera owner (once) and wait until its bus can be attached."""
+    global bus_process
+    if bus_process is None or bus_process.poll() is not None:
+        bus_process = subprocess.Popen([
+            python_path, "-m", "detector.framebus",
+            "--source", FRAME_BUS_SOURCE, "--name", FRAME_BUS_NAME,
+        ])
+    first_seq = None
+    for _ in range(FRAME_BUS_TIMEOUT * 10):
+        if bus_process.poll() is not None:
+            break  # publisher exited: camera could not be opened
+        try:
+            bus = FrameBus.attach(FRAME_BUS_NAME)
+        except (FileNotFoundError, ValueError):
+            bus = None
+        if bus is not None:
+            seq = bus.latest_seq
+            bus.close()
+            # A terminated publisher can leave its segment behind: wait for new frames
+            if first_seq is None:
+                first_seq = seq
+            elif seq != first_seq:
+                return True
+        await asyncio.sleep(0.1)
+    print(f"❌ Frame bus '{FRAME_BUS_NAME}' did not come up")
+    return False
+
+
+def _stop_frame_bus_if_unused():
+    global bus_process
+    running = [p for p in (process, camera_process) if p and p.poll() is None]
+    if not running and bus_process and bus_process.poll() is None:
+        bus_process.terminate()
+        bus_process = None
 
 @router.post("/start")
 async def start_server(request: Request, current_user: dict = Depends(get_current_user)):
@@ -28,6 +77,11 @@ async def start_server(request: Request, current_user: dict = Depends(get_curren
     script_path = os.path.abspath("wild_animal_detection.py")
     python_path = os.path.abspath(os.path.join("venv", "Scripts", "python.exe"))
 
+    if _frame_bus_enabled():
+        if not await _start_frame_bus(python_path):
+            return {"error": "Camera not available"}
+        env["CAMERA_SOURCES"] = f"bus:{FRAME_BUS_NAME}"
+
     process = subprocess.Popen([python_path, script_path], env=env)
 
 
@@ -39,6 +93,7 @@ async def stop_server(current_user: dict = Depends(get_current_user)):
     if process and process.poll() is None:
         process.terminate()
         process = None
+        _stop_frame_bus_if_unused()
         return {"status": "stopped"}
     return {"status": "not running"}
 
@@ -64,6 +119,11 @@ async def start_camera(request: Request, current_user: dict = Depends(get_curren
     script_path = os.path.abspath("camera_stream.py")
     python_path = os.path.abspath(os.path.join("venv", "Scripts", "python.exe"))
 
+    if _frame_bus_enabled():
+        if not await _start_frame_bus(python_path):
+            return {"error": "Camera not available"}
+        env["FRAME_BUS"] = FRAME_BUS_NAME
+
     camera_process = subprocess.Popen([python_path, script_path], env=env)
     return {"status": "camera started"}
 
@@ -73,5 +133,6 @@ async def stop_camera(current_user: dict = Depends(get_current_user)):
     if camera_process and camera_process.poll() is None:
         camera_process.terminate()
         camera_process = None
+        _stop_frame_bus_if_unused()
         return {"status": "camera stopped"}
     return {"status": "camera not running"}
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from backend.deps import get_current_user
+from backend.deps import get_current_user, invalidate_user
 from pydantic import BaseModel
 from bson import ObjectId
 from backend.database import users_collection
@@ -28,4 +28,5 @@ async def register_player(payload: PlayerIn, current_user: dict = Depends(get_cu
         {"_id": user_obj_id},
         {"$addToSet": {"player_ids": payload.player_id}}
     )
+    invalidate_user(current_user["id"])
     return {"ok": True}
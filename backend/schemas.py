@@ -32,9 +32,12 @@ class AlertOut(BaseModel):
     user_id: str
     animal: str
     image_url: Optional[str] = None
+    clip_url: Optional[str] = None
     alert_level: str = "MEDIUM"
     timestamp: datetime
 
 class AlertCreate(BaseModel):
     animal: str
-    image_url: Optional[str] = None
\ No newline at end of file
+    image_url: Optional[str] = None
+    clip_url: Optional[str] = None  # short event clip around the detection
+    timestamp: Optional[datetime] = None  # when it was detected; naive values are UTC
@@ -0,0 +1,65 @@
+# backend/stream.py
+import asyncio
+from collections import defaultdict
+
+from backend.metrics import STREAM_CLIENTS, STREAM_OVERFLOWS
+
+
+class Subscription:
+    def __init__(self, user_id, buffer_size):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=buffer_size)
+        self.overflowed = False
+
+    async def get(self):
+        """Next alert dict, or None once the buffer overflowed (the client must resume)."""
+        return await self.queue.get()
+
+
+class AlertBroker:
+    """
+    In-process pub/sub for the live alert stream, fanned out per user.
+    Every connected client has its own bounded buffer; publish() never
+    waits. A client whose buffer fills up is cut off rather than slowing
+    the others down, and reconnects with its last-seen id to catch up.
+    """
+
+    def __init__(self, buffer_size=100):
+        self.buffer_size = buffer_size
+        self._subscribers = defaultdict(set)  # user_id -> {Subscription}
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, self.buffer_size)
+        self._subscribers[user_id].add(subscription)
+        STREAM_CLIENTS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers is not None and subscription in subscribers:
+            subscribers.discard(subscription)
+            STREAM_CLIENTS.dec()
+            if not subscribers:
+                del self._subscribers[subscription.user_id]
+
+    def publish(self, user_id, alert):
+        for subscription in list(self._subscribers.get(user_id, ())):
+            if subscription.overflowed:
+                continue
+            try:
+                subscription.queue.put_nowait(alert)
+            except asyncio.QueueFull:
+                # Make room for the end-of-stream marker; the client resumes from its last id
+                subscription.overflowed = True
+                STREAM_OVERFLOWS.inc()
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.queue.put_nowait(None)
+
+    def client_count(self, user_id=None):
+        if user_id is not None:
+            return len(self._subscribers.get(user_id, ()))
+        return sum(len(s) for s in self._subscribers.values())
+
+
+broker = AlertBroker()
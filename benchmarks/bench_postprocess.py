@@ -0,0 +1,168 @@
+# benchmarks/bench_postprocess.py
+"""
+Micro-benchmark: per-box Python post-processing vs the vectorized
+detector.postprocess helpers, on frames with many detections.
+
+    python -m benchmarks.bench_postprocess
+    python -m benchmarks.bench_postprocess --animals 40 --humans 15 --repeat 500
+
+Uses torch tensors for the fake YOLO boxes when torch is installed
+(closest to the real per-box .cpu().numpy() cost), plain NumPy otherwise.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from detector.postprocess import extract_detections, pairwise_center_distances, pairwise_iou
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+NAMES = {0: "boar", 1: "elephant", 2: "human", 3: "tiger", 4: "bear"}
+CONF_THRESHOLD = 0.48
+
+
+class _Array:
+    """Stand-in for a tensor when torch is not installed."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.data
+
+    def __getitem__(self, item):
+        return _Array(self.data[item])
+
+    def __int__(self):
+        return int(self.data.reshape(-1)[0])
+
+    def __float__(self):
+        return float(self.data.reshape(-1)[0])
+
+
+def _tensor(data):
+    return torch.from_numpy(data) if torch is not None else _Array(data)
+
+
+class FakeBoxes:
+    def __init__(self, cls, conf, xyxyn):
+        self._data = (cls, conf, xyxyn)
+        self.cls = _tensor(cls)
+        self.conf = _tensor(conf)
+        self.xyxyn = _tensor(xyxyn)
+
+    def __len__(self):
+        return len(self._data[0])
+
+    def __iter__(self):
+        cls, conf, xyxyn = self._data
+        for i in range(len(self)):
+            yield FakeBoxes(cls[i:i + 1], conf[i:i + 1], xyxyn[i:i + 1])
+
+
+class FakeResult:
+    def __init__(self, boxes):
+        self.boxes = boxes
+        self.names = NAMES
+
+
+def make_result(animals, humans, rng):
+    n = animals + humans
+    cls = np.concatenate([rng.choice([0, 1, 3, 4], animals), np.full(humans, 2)]).astype(np.float32)
+    conf = rng.uniform(0.3, 0.95, n).astype(np.float32)
+    xy = rng.uniform(0, 0.8, (n, 2)).astype(np.float32)
+    wh = rng.uniform(0.05, 0.2, (n, 2)).astype(np.float32)
+    return FakeResult(FakeBoxes(cls, conf, np.concatenate([xy, xy + wh], axis=1)))
+
+
+# --- previous per-box implementation, kept here as the baseline ---
+
+def legacy_collect(result):
+    current_detections = []
+    for box in result.boxes:
+        cls_id = int(box.cls)
+        class_name = result.names[cls_id]
+        conf = float(box.conf)
+        bbox = box.xyxyn[0].cpu().numpy()
+        if conf >= CONF_THRESHOLD:
+            current_detections.append({'class': class_name, 'conf': conf, 'bbox': bbox})
+    return current_detections
+
+
+def legacy_iou(bbox1, bbox2):
+    x1_inter = max(bbox1[0], bbox2[0])
+    y1_inter = max(bbox1[1], bbox2[1])
+    x2_inter = min(bbox1[2], bbox2[2])
+    y2_inter = min(bbox1[3], bbox2[3])
+    inter_area = max(0, x2_inter - x1_inter) * max(0, y2_inter - y1_inter)
+    bbox1_area = (bbox1[2] - bbox1[0]) * (bbox1[3] - bbox1[1])
+    bbox2_area = (bbox2[2] - bbox2[0]) * (bbox2[3] - bbox2[1])
+    union_area = bbox1_area + bbox2_area - inter_area
+    return 0 if union_area == 0 else inter_area / union_area
+
+
+def legacy_proximity(animal_bbox, person_bbox):
+    animal_center = np.array([(animal_bbox[0] + animal_bbox[2]) / 2, (animal_bbox[1] + animal_bbox[3]) / 2])
+    person_center = np.array([(person_bbox[0] + person_bbox[2]) / 2, (person_bbox[1] + person_bbox[3]) / 2])
+    return np.linalg.norm(animal_center - person_center)
+
+
+def legacy_frame(result, previous):
+    detections = legacy_collect(result)
+    humans = [d for d in detections if d['class'] == 'human']
+    for d in detections:
+        if d['class'] == 'human':
+            continue
+        for h in humans:
+            legacy_proximity(d['bbox'], h['bbox'])
+        for p in previous:
+            legacy_iou(d['bbox'], p)
+
+
+def vectorized_frame(result, previous):
+    detections = extract_detections(result, CONF_THRESHOLD)
+    is_human = detections['class'] == "human"
+    animals = detections['bbox'][~is_human]
+    pairwise_center_distances(animals, detections['bbox'][is_human]).min(axis=1, initial=np.inf)
+    pairwise_iou(animals, previous)
+
+
+def time_it(fn, repeat):
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--animals", type=int, default=30, help="Animal boxes per frame")
+    parser.add_argument("--humans", type=int, default=10, help="Human boxes per frame")
+    parser.add_argument("--previous", type=int, default=5, help="Previous alert boxes to compare against")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    result = make_result(args.animals, args.humans, rng)
+    previous = make_result(args.previous, 0, rng).boxes._data[2]
+
+    legacy = time_it(lambda: legacy_frame(result, previous), args.repeat)
+    vectorized = time_it(lambda: vectorized_frame(result, previous), args.repeat)
+
+    backend = "torch" if torch is not None else "numpy"
+    print(f"{args.animals} animals, {args.humans} humans, {args.previous} previous alerts ({backend} boxes)")
+    print(f"  per-box loop : {legacy * 1000:8.3f} ms/frame")
+    print(f"  vectorized   : {vectorized * 1000:8.3f} ms/frame")
+    print(f"  speed-up     : {legacy / vectorized:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+# benchmarks/replay.py
+"""
+Replay benchmark: run recorded footage through the detector's motion gate,
+model, post-processing, tracker and alert/cooldown logic, with Cloudinary
+and the backend replaced by local stubs.
+
+    python -m benchmarks.replay footage/night1.mp4 trailcam_sd/ --report replay.json
+
+Each input (video file or image folder) is treated as its own camera, and
+cooldowns run on footage time, so "alerts that would have fired" do not
+depend on how fast the host replays. The JSON report (fps, per-stage
+latency percentiles, alerts, peak memory, commit) is meant to be diffed
+across commits.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+import wild_animal_detection as wad
+from detector.backends import BACKENDS, select_backend
+from detector.footage import iter_frames
+from detector.motion import MotionGate
+from detector.outbox import Outbox, OutboxSender
+from detector.postprocess import extract_detections
+from detector.tracker import Tracker
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    @contextmanager
+    def __call__(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[stage].append(time.perf_counter() - start)
+
+    def report(self):
+        report = {}
+        for stage, values in self.samples.items():
+            ms = np.array(values) * 1000
+            report[stage] = {
+                "count": len(ms),
+                "mean_ms": round(float(ms.mean()), 3),
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p90_ms": round(float(np.percentile(ms, 90)), 3),
+                "p99_ms": round(float(np.percentile(ms, 99)), 3),
+                "max_ms": round(float(ms.max()), 3),
+            }
+        return report
+
+
+class MemorySampler:
+    def __init__(self):
+        self.process = psutil.Process() if psutil else None
+        self.peak = 0
+
+    def sample(self):
+        if self.process is not None:
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def peak_mb(self):
+        # ru_maxrss is in KiB on Linux (bytes on macOS); use whichever is larger
+        rusage = 0
+        if resource is not None:
+            rusage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            if platform.system() != "Darwin":
+                rusage *= 1024
+        return round(max(self.peak, rusage) / (1024 * 1024), 1)
+
+
+class AlertCollector:
+    """Takes the place of the alert queue: keeps the jobs process_detections would have sent."""
+
+    def __init__(self):
+        self.pending = []
+
+    def put(self, job):
+        self.pending.append(job)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay recorded footage through the detection pipeline")
+    parser.add_argument("inputs", nargs="+", help="Video files and/or image folders")
+    parser.add_argument("--report", default="replay_report.json", help="Where to write the JSON report")
+    parser.add_argument("--weights", default=wad.MODEL_PATH)
+    parser.add_argument("--backend", choices=("auto",) + BACKENDS, default=wad.MODEL_BACKEND)
+    parser.add_argument("--motion-threshold", type=float, default=wad.MOTION_THRESHOLD,
+                        help="0 disables the motion gate")
+    parser.add_argument("--keepalive", type=float, default=wad.MOTION_KEEPALIVE)
+    parser.add_argument("--image-fps", type=float, default=5.0,
+                        help="Frame rate assumed for image folders (and videos without one)")
+    parser.add_argument("--stride", type=int, default=1, help="Only replay every Nth frame")
+    parser.add_argument("--max-frames", type=int, default=0, help="Stop each input after N frames")
+    parser.add_argument("--verbose", action="store_true", help="Keep the detector's log lines")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not args.verbose:
+        wad.log = lambda message, key=None, **fields: None
+
+    backend, model = select_backend(args.weights, preference=args.backend)
+    timer = StageTimer()
+    memory = MemorySampler()
+
+    # Local stand-ins for Cloudinary and the backend
+    delivered = []
+    spool = tempfile.mkdtemp(prefix="replay_outbox_")
+    outbox = Outbox(os.path.join(spool, "outbox.db"), os.path.join(spool, "frames"))
+    sender = OutboxSender(outbox, upload=lambda path: f"file://{path}", post=delivered.append)
+
+    # Footage time is anchored here so cooldowns see realistic timestamps
+    epoch = time.time()
+    frames = inferred = gated = 0
+    events = []
+
+    wall_start = time.perf_counter()
+    for index, path in enumerate(args.inputs):
+        camera_id = f"cam{index}"
+        gate = MotionGate(threshold=args.motion_threshold, keepalive_seconds=args.keepalive)
+        tracker = Tracker()
+        alerts = AlertCollector()
+        wad.last_alert_data[camera_id] = {}
+
+        source = iter_frames(path, args.image_fps, max(1, args.stride))
+        input_frames = 0
+        while not args.max_frames or input_frames < args.max_frames:
+            with timer("decode"):
+                item = next(source, None)
+            if item is None:
+                break
+            _, footage_seconds, _, frame = item
+            now = epoch + footage_seconds
+            frames += 1
+            input_frames += 1
+
+            with timer("motion_gate"):
+                run_model = gate.check(frame, now)
+            if not run_model:
+                gated += 1
+                memory.sample()
+                continue
+
+            inferred += 1
+            with timer("inference"):
+                result = model(frame, verbose=False)[0]
+            with timer("postprocess"):
+                detections = extract_detections(result, wad.CONF_THRESHOLD)
+            with timer("tracking"):
+                detections['track_id'] = tracker.update(detections, now)
+            with timer("alert_decision"):
+                wad.process_detections(camera_id, frame, detections, alerts, now)
+
+            for job in alerts.pending:
+                events.append({
+                    "input": path,
+                    "footage_seconds": round(footage_seconds, 2),
+                    "class": job['class'],
+                    "alert_level": job['alert_level'],
+                    "track_id": job['track_id'],
+                    "confidence": round(job['conf'], 3),
+                })
+                with timer("alert_save"):
+                    outbox.add(job['frame'], wad.alert_payload(job))
+                with timer("alert_deliver"):
+                    sender.step()
+            alerts.pending.clear()
+            memory.sample()
+
+    wall = time.perf_counter() - wall_start
+    outbox.close()
+    shutil.rmtree(spool, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "backend": backend,
+        "weights": args.weights,
+        "inputs": args.inputs,
+        "settings": {
+            "motion_threshold": args.motion_threshold,
+            "keepalive": args.keepalive,
+            "stride": args.stride,
+            "conf_threshold": wad.CONF_THRESHOLD,
+        },
+        "frames": frames,
+        "inferred": inferred,
+        "gated": gated,
+        "wall_seconds": round(wall, 3),
+        "fps": round(frames / wall, 2) if wall else 0.0,
+        "inference_fps": round(inferred / wall, 2) if wall else 0.0,
+        "stages": timer.report(),
+        "alerts": {
+            "total": len(events),
+            "delivered": len(delivered),
+            "by_class": dict(Counter(e["class"] for e in events)),
+            "by_level": dict(Counter(e["alert_level"] for e in events)),
+            "events": events,
+        },
+        "peak_rss_mb": memory.peak_mb(),
+    }
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"🎞️ {frames} frames in {wall:.1f}s ({report['fps']} fps), "
+          f"{inferred} inferred, {gated} gated, backend {backend}")
+    for stage, s in report["stages"].items():
+        print(f"   {stage:<15} p50 {s['p50_ms']:8.2f}ms  p90 {s['p90_ms']:8.2f}ms  p99 {s['p99_ms']:8.2f}ms")
+    print(f"🚨 {len(events)} alert(s) would have fired: {report['alerts']['by_class']}")
+    print(f"💾 Peak RSS {report['peak_rss_mb']} MB – report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
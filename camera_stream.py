@@ -1,24 +1,134 @@
 from fastapi import FastAPI, Response
 from fastapi.responses import StreamingResponse
+import asyncio
 import cv2
+import os
+from detector.framebus import open_capture
 
 app = FastAPI()
-camera = cv2.VideoCapture(0)  # Laptop webcam
 
-def gen_frames():
-    while True:
-        success, frame = camera.read()
+# With FRAME_BUS set, read the frames published by `python -m detector.framebus`
+# instead of opening the webcam a second time next to the detector.
+FRAME_BUS = os.getenv("FRAME_BUS")
+# Set to the detector's --annotated-bus / ANNOTATED_BUS to serve boxes-drawn frames
+ANNOTATED_BUS = os.getenv("ANNOTATED_BUS")
+VIDEO_SOURCE = f"bus:{FRAME_BUS}" if FRAME_BUS else 0  # Laptop webcam
+MJPEG_MEDIA_TYPE = 'multipart/x-mixed-replace; boundary=frame'
+
+
+class BroadcastHub:
+    """
+    One producer per source: each frame is read and JPEG-encoded once and the
+    same bytes go to every subscriber. Every client holds at most one pending
+    frame, so a slow client skips frames instead of buffering them. The source
+    is opened with the first subscriber and released when the last one leaves.
+    """
+
+    def __init__(self, open_source):
+        self.open_source = open_source
+        self._subscribers = set()
+        self._producer = None
+        self._lock = asyncio.Lock()
+        self.frames = 0
+        self.dropped = 0
+
+    async def subscribe(self):
+        """Queue of multipart parts for a new client, or None if the source cannot be opened."""
+        async with self._lock:
+            if self._producer is None:
+                source = await asyncio.to_thread(self.open_source)
+                if not source.isOpened():
+                    await asyncio.to_thread(source.release)
+                    return None
+                self._producer = asyncio.create_task(self._produce(source))
+            queue = asyncio.Queue(maxsize=1)
+            self._subscribers.add(queue)
+            return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    @staticmethod
+    def _read_jpeg(source):
+        success, frame = source.read()
         if not success:
-            break
-        else:
-            ret, buffer = cv2.imencode('.jpg', frame)
-            frame = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+            return None
+        ret, buffer = cv2.imencode('.jpg', frame)
+        return buffer.tobytes() if ret else None
+
+    async def _stop(self, source):
+        # Called with the lock held, so a new subscriber waits for the release
+        await asyncio.to_thread(source.release)
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(None)  # source ended: close the remaining streams
+        self._subscribers.clear()
+        self._producer = None
+
+    async def _produce(self, source):
+        while True:
+            async with self._lock:
+                if not self._subscribers:
+                    await self._stop(source)
+                    return
+            jpeg = await asyncio.to_thread(self._read_jpeg, source)
+            if jpeg is None:
+                async with self._lock:
+                    await self._stop(source)
+                return
+
+            part = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n'
+            self.frames += 1
+            for queue in list(self._subscribers):
+                if queue.full():
+                    queue.get_nowait()
+                    self.dropped += 1
+                queue.put_nowait(part)
+
+
+async def mjpeg_stream(hub, queue):
+    try:
+        while True:
+            part = await queue.get()
+            if part is None:
+                break
+            yield part
+    finally:
+        hub.unsubscribe(queue)
+
+
+# Each frame is encoded right after it is read, so ring views are safe here
+video_hub = BroadcastHub(lambda: open_capture(VIDEO_SOURCE, copy=False))
+annotated_hubs = {}  # detector camera id -> BroadcastHub
+
+
+def open_annotated(camera):
+    source = open_capture(f"bus:{ANNOTATED_BUS}-{camera}")
+    # The detector only draws boxes while this reader keeps heartbeating the bus
+    source.mark_viewer = True
+    source.timeout = 60  # a quiet scene may not be re-inferred for a while
+    return source
+
 
 @app.get("/video_feed")
-def video_feed():
-    return StreamingResponse(gen_frames(), media_type='multipart/x-mixed-replace; boundary=frame')
+async def video_feed():
+    queue = await video_hub.subscribe()
+    if queue is None:
+        return Response("Camera not available", status_code=503)
+    return StreamingResponse(mjpeg_stream(video_hub, queue), media_type=MJPEG_MEDIA_TYPE)
+
+@app.get("/annotated_feed")
+async def annotated_feed(camera: str = "cam0"):
+    if not ANNOTATED_BUS:
+        return Response("ANNOTATED_BUS is not configured", status_code=404)
+    hub = annotated_hubs.get(camera)
+    if hub is None:
+        hub = annotated_hubs[camera] = BroadcastHub(lambda: open_annotated(camera))
+    queue = await hub.subscribe()
+    if queue is None:
+        return Response("Annotated stream not available (is the detector running?)", status_code=503)
+    return StreamingResponse(mjpeg_stream(hub, queue), media_type=MJPEG_MEDIA_TYPE)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,171 @@
+# detector/backends.py
+"""
+CPU inference backends for the YOLO model.
+
+The PyTorch checkpoint is exported once to ONNX and/or OpenVINO (optionally
+INT8) next to the weights; every artifact is loaded through ultralytics'
+YOLO(), so callers get the same Results objects (boxes.cls / conf / xyxyn)
+whichever backend runs. With backend "auto" the available ones are
+benchmarked on this host and the fastest is used; the choice is cached in
+<weights>.backend.json until the weights or the host change.
+"""
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import time
+
+import numpy as np
+from ultralytics import YOLO
+
+BACKENDS = ("torch", "onnx", "openvino", "openvino-int8")
+
+# Python package each backend needs at runtime / for export
+_REQUIREMENTS = {
+    "torch": (),
+    "onnx": ("onnx", "onnxruntime"),
+    "openvino": ("openvino",),
+    "openvino-int8": ("openvino", "nncf"),
+}
+
+
+def backend_available(name):
+    return all(importlib.util.find_spec(pkg) is not None for pkg in _REQUIREMENTS[name])
+
+
+def artifact_path(weights, name):
+    stem, _ = os.path.splitext(weights)
+    return {
+        "torch": weights,
+        "onnx": f"{stem}.onnx",
+        "openvino": f"{stem}_openvino_model",
+        "openvino-int8": f"{stem}_int8_openvino_model",
+    }[name]
+
+
+def _is_fresh(path, weights):
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(weights)
+
+
+def export_backend(weights, name, imgsz=640, int8_data=None):
+    """Export `weights` for backend `name` unless an up-to-date artifact already exists."""
+    target = artifact_path(weights, name)
+    if name == "torch" or _is_fresh(target, weights):
+        return target
+
+    print(f"📦 Exporting {os.path.basename(weights)} for {name}...")
+    model = YOLO(weights)
+    if name == "onnx":
+        exported = model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    elif name == "openvino":
+        exported = model.export(format="openvino", imgsz=imgsz, dynamic=True)
+    else:
+        if not int8_data:
+            raise ValueError("openvino-int8 needs a calibration dataset yaml (int8_data)")
+        exported = model.export(format="openvino", imgsz=imgsz, int8=True, data=int8_data)
+
+    exported = str(exported).rstrip("/\\")
+    if os.path.abspath(exported) != os.path.abspath(target):
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        elif os.path.exists(target):
+            os.remove(target)
+        shutil.move(exported, target)
+    return target
+
+
+def load_backend(weights, name, imgsz=640, int8_data=None):
+    path = export_backend(weights, name, imgsz, int8_data)
+    return YOLO(path) if name == "torch" else YOLO(path, task="detect")
+
+
+def warm_up(model, imgsz=640, batch=1, runs=2):
+    """First calls allocate buffers / compile kernels; keep them out of the detection loop."""
+    frames = [np.zeros((imgsz, imgsz, 3), dtype=np.uint8)] * batch
+    for _ in range(runs):
+        model(frames, imgsz=imgsz, verbose=False)
+
+
+def benchmark(model, imgsz=640, batch=1, runs=5):
+    """Median seconds per call on a synthetic frame batch."""
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (imgsz, imgsz, 3), dtype=np.uint8) for _ in range(batch)]
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model(frames, imgsz=imgsz, verbose=False)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def _host_id():
+    return f"{platform.node()}|{platform.machine()}|{platform.processor()}|{os.cpu_count()}"
+
+
+def _cache_path(weights):
+    return f"{weights}.backend.json"
+
+
+def _cached_choice(weights, candidates):
+    try:
+        with open(_cache_path(weights), encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (cached.get("host") == _host_id()
+            and cached.get("weights_mtime") == os.path.getmtime(weights)
+            and cached.get("backend") in candidates):
+        return cached["backend"]
+    return None
+
+
+def select_backend(weights, preference="auto", imgsz=640, batch=1, int8_data=None, rebenchmark=False):
+    """
+    Load the model for `preference`, or for "auto" the fastest backend on this host.
+    Returns (backend name, warmed-up YOLO model).
+    """
+    if preference != "auto":
+        model = load_backend(weights, preference, imgsz, int8_data)
+        warm_up(model, imgsz, batch)
+        return preference, model
+
+    candidates = [name for name in BACKENDS if backend_available(name)]
+    if "openvino-int8" in candidates and not int8_data:
+        candidates.remove("openvino-int8")
+
+    choice = None if rebenchmark else _cached_choice(weights, candidates)
+    if choice is not None:
+        model = load_backend(weights, choice, imgsz, int8_data)
+        warm_up(model, imgsz, batch)
+        return choice, model
+
+    results = {}
+    models = {}
+    for name in candidates:
+        try:
+            model = load_backend(weights, name, imgsz, int8_data)
+            warm_up(model, imgsz, batch)
+            results[name] = benchmark(model, imgsz, batch)
+            models[name] = model
+            print(f"⏱️ {name}: {results[name] * 1000:.1f}ms per batch of {batch}")
+        except Exception as e:
+            print(f"⚠️ Backend {name} unavailable: {type(e).__name__}: {e}")
+
+    if not results:
+        raise RuntimeError(f"No inference backend could load {weights}")
+
+    choice = min(results, key=results.get)
+    try:
+        with open(_cache_path(weights), "w", encoding="utf-8") as f:
+            json.dump({
+                "host": _host_id(),
+                "weights_mtime": os.path.getmtime(weights),
+                "backend": choice,
+                "imgsz": imgsz,
+                "batch": batch,
+                "seconds": results,
+            }, f, indent=2)
+    except OSError as e:
+        print(f"⚠️ Could not cache backend choice: {e}")
+    return choice, models[choice]
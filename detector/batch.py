@@ -0,0 +1,243 @@
+# detector/batch.py
+"""
+Offline batch scan of recorded footage (trail-camera SD cards, incident video).
+
+    python -m detector.batch footage/ sdcard/DCIM --output detections.csv --workers 4
+
+Videos and image folders are split into jobs (one per video, chunks of
+images) and spread over a process pool; each worker loads the model once
+and streams its frames through decode -> batched inference. Every finished
+job is written to <output>.parts/ first, so an interrupted scan resumes
+where it stopped, and the parts are merged into the CSV / JSONL / Parquet
+output at the end.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+
+import cv2
+
+from detector.footage import is_image, is_video, iter_frames
+from detector.postprocess import extract_detections
+
+FORMATS = ("csv", "jsonl", "parquet")
+COLUMNS = ("file", "frame", "seconds", "class", "conf", "x1", "y1", "x2", "y2")
+
+
+def find_jobs(inputs, chunk_size):
+    """Split inputs into jobs: (path, start, stop) with start/stop only used for image folders."""
+    jobs = []
+    for item in inputs:
+        if os.path.isfile(item):
+            if is_video(item):
+                jobs.append((item, 0, None))
+            continue
+        for root, _, files in sorted(os.walk(item)):
+            files = sorted(files)
+            for name in files:
+                if is_video(name):
+                    jobs.append((os.path.join(root, name), 0, None))
+            images = sum(1 for name in files if is_image(name))
+            for start in range(0, images, chunk_size):
+                jobs.append((root, start, start + chunk_size))
+    return jobs
+
+
+def job_key(job, settings):
+    """Stable id of a job's result file; changes when the input or the settings change."""
+    path, start, stop = job
+    raw = json.dumps([os.path.abspath(path), os.path.getmtime(path), start, stop, settings], sort_keys=True)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+# --- worker process ---
+
+_worker = {}
+
+
+def _init_worker(weights, backend, imgsz, threads):
+    cv2.setNumThreads(1)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from detector.backends import load_backend, warm_up
+
+    model = load_backend(weights, backend, imgsz)
+    warm_up(model, imgsz)
+    _worker["model"] = model
+
+
+def _rows(sources, detections):
+    for (index, seconds, source), result in zip(sources, detections):
+        for name, conf, box in zip(result["class"], result["conf"], result["bbox"]):
+            yield {
+                "file": source,
+                "frame": index,
+                "seconds": round(seconds, 3),
+                "class": name,
+                "conf": round(float(conf), 4),
+                "x1": round(float(box[0]), 5),
+                "y1": round(float(box[1]), 5),
+                "x2": round(float(box[2]), 5),
+                "y2": round(float(box[3]), 5),
+            }
+
+
+def run_job(task):
+    """Scan one job and write its rows to `part_path` (atomically). Returns (job, frames, rows, seconds)."""
+    job, part_path, settings = task
+    path, start, stop = job
+    model = _worker["model"]
+    started = time.perf_counter()
+    frames = rows = 0
+
+    tmp_path = f"{part_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        batch, sources = [], []
+
+        def flush():
+            nonlocal rows
+            results = model(batch, imgsz=settings["imgsz"], verbose=False)
+            detections = [extract_detections(r, settings["conf"]) for r in results]
+            for row in _rows(sources, detections):
+                out.write(json.dumps(row) + "\n")
+                rows += 1
+            batch.clear()
+            sources.clear()
+
+        for index, seconds, source, frame in iter_frames(path, settings["image_fps"], settings["stride"], start, stop):
+            batch.append(frame)
+            sources.append((index, seconds, source))
+            frames += 1
+            if len(batch) >= settings["batch"]:
+                flush()
+        if batch:
+            flush()
+
+    os.replace(tmp_path, part_path)
+    return job, frames, rows, time.perf_counter() - started
+
+
+# --- output ---
+
+def _read_parts(part_paths):
+    for part_path in part_paths:
+        with open(part_path, encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+
+def merge_parts(part_paths, output, fmt):
+    """Merge finished job parts, in job order, into the output file. Returns the row count."""
+    count = 0
+    if fmt == "jsonl":
+        with open(output, "w", encoding="utf-8") as out:
+            for part_path in part_paths:
+                with open(part_path, encoding="utf-8") as f:
+                    for line in f:
+                        out.write(line)
+                        count += 1
+    elif fmt == "csv":
+        with open(output, "w", encoding="utf-8", newline="") as out:
+            writer = csv.DictWriter(out, fieldnames=COLUMNS)
+            writer.writeheader()
+            for row in _read_parts(part_paths):
+                writer.writerow(row)
+                count += 1
+    else:
+        try:
+            import pandas as pd
+        except ImportError:
+            raise SystemExit("❌ Parquet output needs pandas and pyarrow (pip install pandas pyarrow)")
+        frame = pd.DataFrame(list(_read_parts(part_paths)), columns=list(COLUMNS))
+        frame.to_parquet(output, index=False)
+        count = len(frame)
+    return count
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scan recorded footage for animals with a process pool")
+    parser.add_argument("inputs", nargs="+", help="Video files and/or folders of videos and images")
+    parser.add_argument("--output", default="detections.csv", help="Detections file (.csv, .jsonl or .parquet)")
+    parser.add_argument("--format", choices=FORMATS, help="Output format (default: from the file extension)")
+    parser.add_argument("--weights", default=os.getenv("MODEL_PATH"), help="YOLO weights (default: MODEL_PATH)")
+    parser.add_argument("--backend", default=os.getenv("MODEL_BACKEND") or "auto",
+                        help="Inference backend; 'auto' is resolved once before the workers start")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: cores / threads)")
+    parser.add_argument("--threads", type=int, default=1, help="Inference threads per worker")
+    parser.add_argument("--batch", type=int, default=8, help="Frames per model call")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.48, help="Confidence threshold")
+    parser.add_argument("--stride", type=int, default=1, help="Only scan every Nth frame")
+    parser.add_argument("--image-fps", type=float, default=1.0,
+                        help="Frame rate assumed for image folders (and videos without one)")
+    parser.add_argument("--chunk", type=int, default=200, help="Images per job")
+    parser.add_argument("--restart", action="store_true", help="Ignore results of a previous run")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not args.weights:
+        raise SystemExit("❌ No weights given (--weights or MODEL_PATH)")
+    fmt = args.format or os.path.splitext(args.output)[1].lstrip(".").lower()
+    if fmt not in FORMATS:
+        raise SystemExit(f"❌ Unknown output format '{fmt}', use one of {', '.join(FORMATS)}")
+
+    backend = args.backend
+    if backend == "auto":
+        # Benchmark once here (and cache it) rather than in every worker
+        from detector.backends import select_backend
+        backend, _ = select_backend(args.weights, preference="auto", imgsz=args.imgsz, batch=args.batch)
+    workers = args.workers or max(1, (os.cpu_count() or 1) // args.threads)
+
+    settings = {
+        "weights": os.path.abspath(args.weights),
+        "backend": backend,
+        "imgsz": args.imgsz,
+        "conf": args.conf,
+        "stride": max(1, args.stride),
+        "image_fps": args.image_fps,
+        "batch": max(1, args.batch),
+    }
+    parts_dir = f"{args.output}.parts"
+    os.makedirs(parts_dir, exist_ok=True)
+
+    jobs = find_jobs(args.inputs, max(1, args.chunk))
+    part_paths = [os.path.join(parts_dir, f"{job_key(job, settings)}.jsonl") for job in jobs]
+    if args.restart:
+        for part_path in part_paths:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+    todo = [(job, part, settings) for job, part in zip(jobs, part_paths) if not os.path.exists(part)]
+    print(f"🗂️ {len(jobs)} job(s), {len(jobs) - len(todo)} already done, "
+          f"{workers} worker(s) on backend {backend}")
+
+    started = time.perf_counter()
+    frames = 0
+    if todo:
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(min(workers, len(todo)), initializer=_init_worker,
+                      initargs=(args.weights, backend, args.imgsz, args.threads)) as pool:
+            for done, ((path, start, stop), job_frames, rows, seconds) in enumerate(
+                    pool.imap_unordered(run_job, todo), 1):
+                frames += job_frames
+                label = path if stop is None else f"{path} [{start}:{stop}]"
+                print(f"✅ [{done}/{len(todo)}] {label}: {job_frames} frames, {rows} detections "
+                      f"in {seconds:.1f}s")
+
+    elapsed = time.perf_counter() - started
+    count = merge_parts(part_paths, args.output, fmt)
+    fps = frames / elapsed if elapsed else 0.0
+    print(f"🎞️ Scanned {frames} frames in {elapsed:.1f}s ({fps:.1f} fps) – "
+          f"{count} detections written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# detector/cadence.py
+import time
+
+THREAT_LEVELS = ("HIGH", "CRITICAL")
+
+
+class CadenceController:
+    """
+    Picks how often the model may run.
+    The interval between inference starts is the measured model latency
+    divided by the CPU budget (the share of wall time inference may use).
+    A HIGH/CRITICAL animal in view switches to the larger threat budget for
+    `threat_hold_seconds`; an empty scene is held to at most one run per
+    `idle_interval` seconds.
+    """
+
+    def __init__(self, cpu_budget=0.5, threat_cpu_budget=0.9, idle_interval=1.0,
+                 min_interval=0.0, threat_hold_seconds=10):
+        self.cpu_budget = cpu_budget
+        self.threat_cpu_budget = threat_cpu_budget
+        self.idle_interval = idle_interval
+        self.min_interval = min_interval
+        self.threat_hold_seconds = threat_hold_seconds
+
+        self.latency = 0.0          # smoothed seconds per model call
+        self.state = "idle"         # idle | active | threat
+        self._threat_until = 0.0
+        self._last_start = 0.0
+        self.runs = 0
+        self.waited_seconds = 0.0
+
+    def interval(self):
+        """Seconds that should separate two model calls right now."""
+        budget = self.threat_cpu_budget if self.state == "threat" else self.cpu_budget
+        interval = self.latency / budget if budget > 0 else self.latency
+        if self.state == "idle":
+            interval = max(interval, self.idle_interval)
+        return max(interval, self.min_interval)
+
+    def wait_for_slot(self, stop_event=None):
+        """Block until the next inference is allowed; returns False if stopped."""
+        delay = self._last_start + self.interval() - time.monotonic()
+        if delay > 0:
+            self.waited_seconds += delay
+            if stop_event is not None:
+                if stop_event.wait(delay):
+                    return False
+            else:
+                time.sleep(delay)
+        return True
+
+    def start(self):
+        """Mark the start of a model call."""
+        self._last_start = time.monotonic()
+
+    def record(self, latency, alert_levels):
+        """
+        Feed back one model call: its latency and the alert levels seen in it.
+        """
+        if self.latency == 0.0:
+            self.latency = latency
+        else:
+            self.latency = 0.8 * self.latency + 0.2 * latency
+        self.runs += 1
+
+        now = time.monotonic()
+        if any(level in THREAT_LEVELS for level in alert_levels):
+            self._threat_until = now + self.threat_hold_seconds
+
+        if now < self._threat_until:
+            self.state = "threat"
+        elif alert_levels:
+            self.state = "active"
+        else:
+            self.state = "idle"
+
+    def summary(self):
+        interval = self.interval()
+        rate = 1 / interval if interval > 0 else float("inf")
+        return (f"{self.state}, model {self.latency * 1000:.0f}ms, "
+                f"interval {interval * 1000:.0f}ms (~{rate:.1f}/s), {self.runs} runs")
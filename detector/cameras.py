@@ -0,0 +1,98 @@
+# detector/cameras.py
+import time
+
+from detector.framebus import FrameBus, open_capture
+from detector.pipeline import DropOldestQueue
+from detector.roi import crop_regions
+from detector.tracker import Tracker
+
+
+def parse_sources(value):
+    """
+    Parse a comma separated camera list, e.g. "0,1,rtsp://10.0.0.5/stream".
+    Digits are treated as local device indexes, "bus:<name>" as a shared-memory
+    frame bus (see detector/framebus.py), anything else as a URL/path.
+    """
+    sources = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        sources.append(int(item) if item.isdigit() else item)
+    return sources
+
+
+class Camera:
+    """One capture source plus the latest-frame hand-off to the shared model."""
+
+    def __init__(self, index, source, motion_gate=None, display=True, annotated_bus=None, rois=None):
+        self.id = f"cam{index}"
+        self.source = source
+        # Normalized (K, 4) regions the model looks at instead of the full frame
+        self.rois = rois
+        self.motion_gate = motion_gate
+        self.tracker = Tracker()
+        self.cap = None
+        self.frame_count = 0
+        # Batched inference only ever wants this camera's newest frame
+        self.frames = DropOldestQueue(f"{self.id}-frames", maxsize=1)
+        # Pre-roll FrameRing for event clips (None when clips are disabled)
+        self.clip_ring = None
+        # Local window (None when headless)
+        self.display = DropOldestQueue(f"{self.id}-display", maxsize=1) if display else None
+        # Shared-memory bus the annotated stream endpoint reads from
+        self.annotated_bus_name = f"{annotated_bus}-{self.id}" if annotated_bus else None
+        self.annotated_bus = None
+
+    def model_inputs(self, frame):
+        """Images this frame contributes to the model batch: the frame itself or its ROI crops."""
+        return [frame] if self.rois is None else crop_regions(frame, self.rois)
+
+    def open(self):
+        self.cap = open_capture(self.source)
+        return self.cap.isOpened()
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if ret:
+            self.frame_count += 1
+        return ret, frame
+
+    def wants_annotation(self, shape):
+        """Only draw boxes when a window is open or someone is pulling the annotated stream."""
+        if self.display is not None:
+            return True
+        if self.annotated_bus_name is None:
+            return False
+        if self.annotated_bus is None:
+            self.annotated_bus = FrameBus.create(self.annotated_bus_name, shape, slots=2)
+        return self.annotated_bus.has_viewers()
+
+    def show(self, annotated):
+        if self.display is not None:
+            self.display.put(annotated)
+        if self.annotated_bus is not None:
+            self.annotated_bus.publish(annotated)
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+        if self.annotated_bus is not None:
+            self.annotated_bus.close()
+
+
+def collect_latest(cameras, timeout=0.5, poll_interval=0.005):
+    """
+    Take the newest pending frame from every camera.
+    Waits up to `timeout` for at least one frame; returns [(camera, frame), ...].
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        batch = []
+        for camera in cameras:
+            frame = camera.frames.get_nowait()
+            if frame is not None:
+                batch.append((camera, frame))
+        if batch or time.monotonic() >= deadline:
+            return batch
+        time.sleep(poll_interval)
@@ -0,0 +1,147 @@
+# detector/clips.py
+import math
+import os
+import threading
+import time
+import uuid
+
+import cv2
+import numpy as np
+
+
+class FrameRing:
+    """
+    Last `seconds` of a camera at `fps`, downscaled to `width`, in one
+    pre-allocated (N, H, W, 3) array. push() resizes straight into the next
+    slot, so steady-state capture allocates nothing and memory never grows.
+    """
+
+    def __init__(self, seconds, fps=8, width=640):
+        self.fps = fps
+        self.width = width
+        self.capacity = max(2, math.ceil(seconds * fps))
+        self._lock = threading.Lock()
+        self._frames = None  # allocated on the first frame, once the shape is known
+        self._times = np.zeros(self.capacity, dtype=np.float64)
+        self._next = 0
+        self._count = 0
+        self._last_push = 0.0
+
+    def _allocate(self, frame):
+        h, w = frame.shape[:2]
+        width = min(self.width, w)
+        height = max(2, int(round(h * width / w / 2)) * 2)  # even sizes keep video encoders happy
+        width -= width % 2
+        self._frames = np.zeros((self.capacity, height, width, 3), dtype=np.uint8)
+
+    def push(self, frame, now=None):
+        """Store `frame` if a slot is due at the ring's frame rate."""
+        now = time.time() if now is None else now
+        if now - self._last_push < 1.0 / self.fps:
+            return False
+        with self._lock:
+            if self._frames is None:
+                self._allocate(frame)
+            slot = self._frames[self._next]
+            height, width = slot.shape[:2]
+            if frame.shape[:2] == (height, width):
+                np.copyto(slot, frame)
+            else:
+                cv2.resize(frame, (width, height), dst=slot, interpolation=cv2.INTER_AREA)
+            self._times[self._next] = now
+            self._next = (self._next + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+        self._last_push = now
+        return True
+
+    def snapshot(self, start, end):
+        """Copies of the frames with start <= timestamp <= end, oldest first."""
+        with self._lock:
+            if self._frames is None:
+                return []
+            first = (self._next - self._count) % self.capacity
+            order = (first + np.arange(self._count)) % self.capacity
+            times = self._times[order]
+            picked = order[(times >= start) & (times <= end)]
+            return [self._frames[i].copy() for i in picked]
+
+
+class ClipRecorder:
+    """
+    Turns alerts into short event clips: `pre_seconds` before the alert plus
+    `post_seconds` after it, read from each camera's FrameRing. step() runs on
+    its own worker, waits for the post-roll to be captured, encodes the clip
+    and hands its path to `on_clip(row_id, path)` (None if nothing was recorded).
+    """
+
+    def __init__(self, clip_dir, on_clip, pre_seconds=5, post_seconds=3, fps=8, width=640, poll_timeout=0.5):
+        self.clip_dir = clip_dir
+        self.on_clip = on_clip
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.fps = fps
+        self.width = width
+        self.poll_timeout = poll_timeout
+        os.makedirs(clip_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._pending = []  # (due_at, ring, row_id, alert_time)
+        self._wakeup = threading.Event()
+        self.encoded = 0
+        self.encode_seconds = 0.0
+
+    def new_ring(self):
+        # One second of slack so the post-roll is still in the ring when step() runs
+        return FrameRing(self.pre_seconds + self.post_seconds + 1, self.fps, self.width)
+
+    def request(self, ring, row_id, alert_time):
+        with self._lock:
+            self._pending.append((alert_time + self.post_seconds, ring, row_id, alert_time))
+        self._wakeup.set()
+
+    def _take_due(self, now):
+        with self._lock:
+            due = [p for p in self._pending if p[0] <= now]
+            self._pending = [p for p in self._pending if p[0] > now]
+            wait = min((p[0] for p in self._pending), default=now + self.poll_timeout) - now
+        return due, wait
+
+    def encode(self, frames):
+        path = os.path.join(self.clip_dir, f"{uuid.uuid4().hex}.mp4")
+        height, width = frames[0].shape[:2]
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), self.fps, (width, height))
+        try:
+            for frame in frames:
+                writer.write(frame)
+        finally:
+            writer.release()
+        return path
+
+    def step(self):
+        """Encode every clip whose post-roll is complete; used as a StageWorker handler."""
+        due, wait = self._take_due(time.time())
+        if not due:
+            self._wakeup.wait(min(self.poll_timeout, max(0.0, wait)))
+            self._wakeup.clear()
+            return
+
+        for _, ring, row_id, alert_time in due:
+            frames = ring.snapshot(alert_time - self.pre_seconds, alert_time + self.post_seconds)
+            path = None
+            if frames:
+                start = time.perf_counter()
+                path = self.encode(frames)
+                self.encode_seconds += time.perf_counter() - start
+                self.encoded += 1
+            self.on_clip(row_id, path)
+
+    def flush(self):
+        """Encode whatever is still pending (at shutdown) with the frames available."""
+        with self._lock:
+            for i, (_, ring, row_id, alert_time) in enumerate(self._pending):
+                self._pending[i] = (0.0, ring, row_id, alert_time)
+        self.step()
+
+    def summary(self):
+        avg = self.encode_seconds / self.encoded * 1000 if self.encoded else 0.0
+        return f"{self.encoded} clip(s) encoded, avg {avg:.0f}ms, {len(self._pending)} waiting for post-roll"
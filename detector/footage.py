@@ -0,0 +1,51 @@
+# detector/footage.py
+"""
+Frames from recorded footage: video files and folders of images (e.g. a
+trail camera's SD card). Shared by the batch scanner (detector/batch.py)
+and the replay benchmark (benchmarks/replay.py).
+"""
+import glob
+import os
+
+import cv2
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v", ".mts")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def is_video(path):
+    return path.lower().endswith(VIDEO_EXTENSIONS)
+
+
+def is_image(path):
+    return path.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def iter_frames(path, image_fps, stride=1, start=0, stop=None):
+    """
+    Yield (frame index, seconds, source file, frame) from a video file or an image folder.
+    Images are timed at `image_fps`. For folders, `start`/`stop` select a slice of the
+    sorted image list.
+    """
+    if os.path.isdir(path):
+        files = sorted(f for f in glob.glob(os.path.join(path, "*")) if is_image(f))
+        for i in range(start, len(files) if stop is None else min(stop, len(files)), stride):
+            frame = cv2.imread(files[i])
+            if frame is not None:
+                yield i, i / image_fps, files[i], frame
+        return
+
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or image_fps
+    index = 0
+    while True:
+        # grab() skips the decode of frames that fall between strides
+        if not cap.grab():
+            break
+        if index % stride == 0:
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            yield index, index / fps, path, frame
+        index += 1
+    cap.release()
@@ -0,0 +1,240 @@
+# detector/framebus.py
+"""
+Single-capture frame bus.
+
+One process owns the camera and publishes decoded frames into a
+shared-memory ring buffer; the detector and the MJPEG stream attach to it
+instead of opening the camera again. FrameBus.read can hand out zero-copy
+NumPy views; BusCapture copies by default because the detector keeps its
+frames for longer than the ring does.
+
+    python -m detector.framebus --source 0 --name wildcam
+
+Consumers then use the source "bus:wildcam" (CAMERA_SOURCES / --sources for
+the detector, FRAME_BUS=wildcam for camera_stream.py).
+"""
+import argparse
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import cv2
+import numpy as np
+
+MAGIC = 0x57414442  # "WADB"
+# magic, slots, height, width, channels, latest seq, publisher closed flag, last viewer heartbeat (ms)
+_HEADER_FIELDS = 8
+_HEADER_BYTES = _HEADER_FIELDS * 8
+
+
+def _layout(slots):
+    seq_offset = _HEADER_BYTES
+    ts_offset = seq_offset + slots * 8
+    data_offset = ts_offset + slots * 8
+    data_offset += (-data_offset) % 64  # cache-line align the frame data
+    return seq_offset, ts_offset, data_offset
+
+
+class FrameBus:
+    """
+    Ring of `slots` fixed-size frames in shared memory.
+    Each slot carries the sequence number of the frame in it (0 while it is
+    being written), so readers can tell a finished frame from a torn one.
+    """
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((_HEADER_FIELDS,), dtype=np.uint64, buffer=shm.buf)
+        if int(self.header[0]) != MAGIC:
+            raise ValueError(f"Shared memory '{shm.name}' is not a frame bus")
+
+        self.slots = int(self.header[1])
+        self.shape = (int(self.header[2]), int(self.header[3]), int(self.header[4]))
+        seq_offset, ts_offset, data_offset = _layout(self.slots)
+        self.slot_seq = np.ndarray((self.slots,), dtype=np.uint64, buffer=shm.buf, offset=seq_offset)
+        self.slot_ts = np.ndarray((self.slots,), dtype=np.float64, buffer=shm.buf, offset=ts_offset)
+        self.frames = np.ndarray((self.slots,) + self.shape, dtype=np.uint8, buffer=shm.buf, offset=data_offset)
+
+    @classmethod
+    def create(cls, name, shape, slots=8):
+        height, width, channels = shape
+        _, _, data_offset = _layout(slots)
+        size = data_offset + slots * height * width * channels
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a publisher that did not shut down cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        header = np.ndarray((_HEADER_FIELDS,), dtype=np.uint64, buffer=shm.buf)
+        header[:] = 0
+        header[1:5] = (slots, height, width, channels)
+        header[0] = MAGIC
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        shm = shared_memory.SharedMemory(name=name)
+        # Readers must not unlink the segment when they exit (Python < 3.13 tracks it anyway)
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return cls(shm, owner=False)
+
+    @property
+    def latest_seq(self):
+        return int(self.header[5])
+
+    @property
+    def closed(self):
+        return bool(self.header[6])
+
+    def touch(self):
+        """Mark that someone is watching this bus right now."""
+        self.header[7] = int(time.time() * 1000)
+
+    def has_viewers(self, within=2.0):
+        """True if a reader called touch() in the last `within` seconds."""
+        return time.time() * 1000 - int(self.header[7]) < within * 1000
+
+    def publish(self, frame):
+        """Copy one frame into the next slot. Single writer only."""
+        seq = self.latest_seq + 1
+        slot = seq % self.slots
+        self.slot_seq[slot] = 0
+        if frame.shape != self.shape:
+            frame = cv2.resize(frame, (self.shape[1], self.shape[0]))
+        self.frames[slot][...] = frame
+        self.slot_ts[slot] = time.time()
+        self.slot_seq[slot] = seq
+        self.header[5] = seq
+        return seq
+
+    def read(self, after_seq=0, copy=False):
+        """
+        Newest frame with a sequence number above `after_seq`.
+        Returns (seq, timestamp, frame) or None if nothing newer is ready.
+        Without `copy` the frame is a view into the ring; it stays valid until
+        the publisher wraps around to its slot (see `is_current`).
+        """
+        seq = self.latest_seq
+        if seq <= after_seq:
+            return None
+        slot = seq % self.slots
+        if int(self.slot_seq[slot]) != seq:
+            return None
+        frame = self.frames[slot]
+        timestamp = float(self.slot_ts[slot])
+        if copy:
+            frame = frame.copy()
+            if int(self.slot_seq[slot]) != seq:
+                return None
+        return seq, timestamp, frame
+
+    def is_current(self, seq):
+        """True while the slot that held `seq` has not been overwritten."""
+        return int(self.slot_seq[seq % self.slots]) == seq
+
+    def close(self):
+        if self.owner:
+            self.header[6] = 1
+        # Drop our views before closing the mapping
+        self.header = self.slot_seq = self.slot_ts = self.frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # a consumer still holds a frame view; the mapping goes away with the process
+        if self.owner:
+            self.shm.unlink()
+
+
+class BusCapture:
+    """
+    cv2.VideoCapture-like reader for a frame bus: read() blocks for the next frame.
+    Like VideoCapture, every frame is the caller's own copy. Pass copy=False for
+    ring views, only when a frame is used up before the publisher wraps around
+    to its slot. With `mark_viewer` every read also heartbeats the bus, so a
+    publisher that renders on demand (annotated frames) knows someone is watching.
+    """
+
+    def __init__(self, name, timeout=5.0, poll_interval=0.002, mark_viewer=False, copy=True):
+        self.name = name
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.mark_viewer = mark_viewer
+        self.copy = copy
+        self.last_seq = 0
+        try:
+            self.bus = FrameBus.attach(name)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"❌ Frame bus '{name}' not available: {e}")
+            self.bus = None
+
+    def isOpened(self):
+        return self.bus is not None
+
+    def read(self):
+        if self.bus is None:
+            return False, None
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            if self.bus.closed:
+                return False, None
+            if self.mark_viewer:
+                self.bus.touch()
+            item = self.bus.read(self.last_seq, copy=self.copy)
+            if item is not None:
+                self.last_seq, _, frame = item
+                return True, frame
+            time.sleep(self.poll_interval)
+        return False, None
+
+    def release(self):
+        if self.bus is not None:
+            self.bus.close()
+            self.bus = None
+
+
+def open_capture(source, copy=True):
+    """
+    Open a camera index / URL, or a frame bus for sources written as "bus:<name>".
+    `copy=False` gives zero-copy bus frames; see BusCapture.
+    """
+    if isinstance(source, str) and source.startswith("bus:"):
+        return BusCapture(source[len("bus:"):], copy=copy)
+    return cv2.VideoCapture(source)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Own the camera and publish frames to a shared-memory bus")
+    parser.add_argument("--source", default="0", help="Camera index or stream URL")
+    parser.add_argument("--name", default="wildcam", help="Shared memory name consumers attach to")
+    parser.add_argument("--slots", type=int, default=8, help="Frames kept in the ring")
+    args = parser.parse_args()
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    cap = cv2.VideoCapture(source)
+    ret, frame = cap.read()
+    if not ret:
+        raise SystemExit(f"❌ Could not read from {args.source}")
+
+    bus = FrameBus.create(args.name, frame.shape, args.slots)
+    print(f"📡 Publishing {frame.shape[1]}x{frame.shape[0]} frames from {args.source} to bus '{args.name}'")
+    try:
+        while ret:
+            bus.publish(frame)
+            ret, frame = cap.read()
+        print("❌ Camera read failed – stopping publisher")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cap.release()
+        bus.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# detector/logwriter.py
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+_STOP = object()
+
+
+def _format_ts(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class LogWriter:
+    """
+    Background log writer.
+    write() only enqueues; a worker thread batches records and flushes them
+    every `flush_interval` seconds or `max_batch` records, as JSON lines.
+    The file rotates by size and age (path.1 ... path.<backups>).
+    Records written with a `key` are collapsed: the first one in each
+    `summary_window` is written, the rest are counted and reported in one
+    summary line when the window closes.
+    """
+
+    def __init__(self, path, flush_interval=1.0, max_batch=256, max_bytes=10 * 1024 * 1024,
+                 max_age=24 * 3600, backups=5, summary_window=60, max_pending=10000, echo=True):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backups = backups
+        self.summary_window = summary_window
+        self.echo = echo
+        self.dropped = 0
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._repeats = {}  # key -> {"first": ts, "count": n, "last": record}
+        self._open()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, message, key=None, **fields):
+        """Queue one record; never blocks the caller (drops when the queue is full)."""
+        record = {"ts": time.time(), "msg": message}
+        record.update(fields)
+        try:
+            self._queue.put_nowait((record, key))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self._queue.put((_STOP, None))
+        self._thread.join(timeout=5)
+
+    # --- worker thread ---
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._opened_at = time.time()
+
+    def _run(self):
+        batch = []
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, last_flush + self.flush_interval - time.monotonic())
+            try:
+                record, key = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                record = None
+
+            if record is _STOP:
+                break
+            if record is not None:
+                self._accept(record, key, batch)
+
+            if len(batch) >= self.max_batch or time.monotonic() - last_flush >= self.flush_interval:
+                self._close_windows(batch, time.time())
+                self._flush(batch)
+                last_flush = time.monotonic()
+
+        # Drain whatever is still queued, then report open windows
+        while True:
+            try:
+                record, key = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is not _STOP:
+                self._accept(record, key, batch)
+        self._close_windows(batch, time.time(), force=True)
+        self._flush(batch)
+        self._file.close()
+
+    def _accept(self, record, key, batch):
+        if key is None:
+            batch.append(record)
+            return
+        state = self._repeats.get(key)
+        if state is None:
+            self._repeats[key] = {"first": record["ts"], "count": 0, "last": record}
+            batch.append(record)
+        else:
+            state["count"] += 1
+            state["last"] = record
+
+    def _close_windows(self, batch, now, force=False):
+        for key, state in list(self._repeats.items()):
+            elapsed = now - state["first"]
+            if not force and elapsed < self.summary_window:
+                continue
+            if state["count"]:
+                batch.append({
+                    "ts": now,
+                    "msg": f"{state['last']['msg']} – seen {state['count']} more times in last {elapsed:.0f}s",
+                    "key": key,
+                    "repeats": state["count"],
+                })
+            del self._repeats[key]
+
+    def _rotate_if_needed(self):
+        too_big = self._file.tell() >= self.max_bytes
+        too_old = self.max_age is not None and time.time() - self._opened_at >= self.max_age
+        if not (too_big or too_old) or self._file.tell() == 0:
+            return
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        if self.echo:
+            print("\n".join(f"[{_format_ts(r['ts'])}] {r['msg']}" for r in batch), flush=True)
+        self._rotate_if_needed()
+        lines = []
+        for r in batch:
+            r = dict(r, ts=datetime.fromtimestamp(r["ts"]).isoformat(timespec="milliseconds"))
+            lines.append(json.dumps(r, ensure_ascii=False, default=str))
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+        batch.clear()
@@ -0,0 +1,65 @@
+# detector/metrics.py
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+# Seconds; inference on CPU can take well over a second, uploads several
+_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+STAGE_SECONDS = Histogram(
+    "detector_stage_seconds",
+    "Time spent in each detector stage",
+    ["stage"],
+    buckets=_BUCKETS,
+)
+FRAMES = Counter(
+    "detector_frames_total",
+    "Frames per camera by outcome (captured, gated, inferred)",
+    ["camera", "outcome"],
+)
+ALERTS = Counter(
+    "detector_alerts_total",
+    "Alerts queued for delivery",
+    ["camera", "animal", "level"],
+)
+DELIVERIES = Counter(
+    "detector_deliveries_total",
+    "Outbox delivery attempts by outcome",
+    ["step", "outcome"],
+)
+QUEUE_DEPTH = Gauge("detector_queue_depth", "Items waiting in a pipeline queue", ["queue"])
+QUEUE_DROPPED = Gauge("detector_queue_dropped", "Items dropped by a drop-oldest queue since start", ["queue"])
+OUTBOX_ROWS = Gauge("detector_outbox_rows", "Alerts stored in the outbox", ["status"])
+INFERENCE_INTERVAL = Gauge("detector_inference_interval_seconds", "Current pacing interval between model calls")
+
+
+@contextmanager
+def timed(stage):
+    """Observe the duration of the with-block under `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+def watch_queues(queues):
+    """Expose depth and drop counts of DropOldestQueue instances, read at scrape time."""
+    for q in queues:
+        QUEUE_DEPTH.labels(q.name).set_function(q.depth)
+        QUEUE_DROPPED.labels(q.name).set_function(lambda q=q: q.dropped)
+
+
+def watch_outbox(outbox):
+    for status in ("pending", "failed"):
+        OUTBOX_ROWS.labels(status).set_function(lambda status=status: outbox.counts().get(status, 0))
+
+
+def watch_cadence(cadence):
+    INFERENCE_INTERVAL.set_function(cadence.interval)
+
+
+def start_metrics_server(port):
+    """Serve /metrics in Prometheus text format on a background thread."""
+    start_http_server(port)
@@ -0,0 +1,88 @@
+# detector/motion.py
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Cheap motion check in front of the model.
+    Compares a small blurred grayscale copy of each frame against a running
+    background average and only lets the frame through when enough pixels
+    changed, or when `keepalive_seconds` passed since the last inference.
+    """
+
+    def __init__(self, threshold=0.01, pixel_delta=25, keepalive_seconds=30,
+                 width=160, learning_rate=0.05):
+        self.threshold = threshold          # fraction of changed pixels that counts as motion
+        self.pixel_delta = pixel_delta      # per-pixel gray level change that counts as changed
+        self.keepalive_seconds = keepalive_seconds
+        self.width = width
+        self.learning_rate = learning_rate
+
+        self._background = None
+        self._last_pass = 0.0
+        self.last_motion_ratio = 0.0
+
+        self.checked = 0
+        self.passed_motion = 0
+        self.passed_keepalive = 0
+        self.gated = 0
+        self.avg_inference_seconds = 0.0
+
+    def _prepare(self, frame):
+        h, w = frame.shape[:2]
+        height = max(1, int(h * self.width / w))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def check(self, frame, now=None):
+        """Return True if the model should run on this frame (`now` lets replays use footage time)."""
+        self.checked += 1
+        now = time.monotonic() if now is None else now
+        gray = self._prepare(frame)
+
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray.astype(np.float32)
+            self._last_pass = now
+            self.passed_keepalive += 1
+            return True
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        self.last_motion_ratio = np.count_nonzero(diff > self.pixel_delta) / diff.size
+        cv2.accumulateWeighted(gray, self._background, self.learning_rate)
+
+        if self.last_motion_ratio >= self.threshold:
+            self.passed_motion += 1
+        elif now - self._last_pass >= self.keepalive_seconds:
+            self.passed_keepalive += 1
+        else:
+            self.gated += 1
+            return False
+
+        self._last_pass = now
+        return True
+
+    def record_inference(self, seconds):
+        """Feed back measured per-frame inference time (used for the time-saved estimate)."""
+        if self.avg_inference_seconds == 0.0:
+            self.avg_inference_seconds = seconds
+        else:
+            self.avg_inference_seconds = 0.9 * self.avg_inference_seconds + 0.1 * seconds
+
+    def stats(self):
+        return {
+            "checked": self.checked,
+            "gated": self.gated,
+            "motion": self.passed_motion,
+            "keepalive": self.passed_keepalive,
+            "saved_seconds": self.gated * self.avg_inference_seconds,
+        }
+
+    def summary(self):
+        s = self.stats()
+        return (f"gated {s['gated']}/{s['checked']}, motion {s['motion']}, "
+                f"keep-alive {s['keepalive']}, ~{s['saved_seconds']:.1f}s inference saved")
@@ -0,0 +1,276 @@
+# detector/outbox.py
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+import cv2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    payload TEXT NOT NULL,
+    image_path TEXT,
+    image_url TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    clip_state TEXT,
+    clip_path TEXT,
+    clip_url TEXT,
+    clip_attempts INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+# Columns added after the first release; ALTERed into existing outbox.db files
+_ADDED_COLUMNS = {
+    "clip_state": "TEXT",
+    "clip_path": "TEXT",
+    "clip_url": "TEXT",
+    "clip_attempts": "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+class PermanentDeliveryError(Exception):
+    """The backend rejected the alert; retrying will not help."""
+
+
+class Outbox:
+    """
+    Durable alert queue: a SQLite table plus a spool directory for frames.
+    Rows survive restarts and are delivered oldest first by OutboxSender.
+    """
+
+    def __init__(self, db_path="outbox.db", spool_dir="outbox_spool"):
+        self.db_path = db_path
+        self.spool_dir = spool_dir
+        os.makedirs(spool_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")}
+        for column, kind in _ADDED_COLUMNS.items():
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE outbox ADD COLUMN {column} {kind}")
+        self._conn.commit()
+        self.wakeup = threading.Event()
+
+    def add(self, frame, payload, clip_pending=False):
+        """
+        Spool the frame to disk and record the alert. Never touches the network.
+        With `clip_pending` the sender holds the row until attach_clip() is called.
+        """
+        image_path = None
+        if frame is not None:
+            image_path = os.path.join(self.spool_dir, f"{uuid.uuid4().hex}.jpg")
+            cv2.imwrite(image_path, frame)
+
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO outbox (created_at, payload, image_path, clip_state) VALUES (?, ?, ?, ?)",
+                (time.time(), json.dumps(payload), image_path, "recording" if clip_pending else None),
+            )
+            self._conn.commit()
+        self.wakeup.set()
+        return cur.lastrowid
+
+    def next_pending(self):
+        """Oldest pending row, or None. Delivery is strictly in order."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, payload, image_path, image_url, attempts, next_attempt_at, "
+                "created_at, clip_state, clip_path, clip_url, clip_attempts "
+                "FROM outbox WHERE status = 'pending' ORDER BY id LIMIT 1"
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "payload": json.loads(row[1]),
+            "image_path": row[2],
+            "image_url": row[3],
+            "attempts": row[4],
+            "next_attempt_at": row[5],
+            "created_at": row[6],
+            "clip_state": row[7],
+            "clip_path": row[8],
+            "clip_url": row[9],
+            "clip_attempts": row[10],
+        }
+
+    def set_image_url(self, row_id, image_url):
+        with self._lock:
+            self._conn.execute("UPDATE outbox SET image_url = ? WHERE id = ?", (image_url, row_id))
+            self._conn.commit()
+
+    def attach_clip(self, row_id, clip_path):
+        """Record the encoded event clip (None if there was nothing to encode)."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE outbox SET clip_state = ?, clip_path = ? WHERE id = ?",
+                ("ready" if clip_path else None, clip_path, row_id),
+            )
+            self._conn.commit()
+        if cur.rowcount == 0:
+            # The alert went out without it (clip_wait ran out); don't leave the file behind
+            if clip_path and os.path.exists(clip_path):
+                os.remove(clip_path)
+            return
+        self.wakeup.set()
+
+    def set_clip_url(self, row_id, clip_url):
+        with self._lock:
+            self._conn.execute("UPDATE outbox SET clip_url = ? WHERE id = ?", (clip_url, row_id))
+            self._conn.commit()
+
+    def mark_clip_failed(self, row_id):
+        with self._lock:
+            self._conn.execute("UPDATE outbox SET clip_attempts = clip_attempts + 1 WHERE id = ?", (row_id,))
+            self._conn.commit()
+
+    def drop_clip(self, row):
+        """Give up on the row's clip; the alert is sent with its image only."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET clip_state = 'dropped', clip_path = NULL, "
+                "clip_attempts = clip_attempts + 1 WHERE id = ?",
+                (row["id"],),
+            )
+            self._conn.commit()
+        if row["clip_path"] and os.path.exists(row["clip_path"]):
+            os.remove(row["clip_path"])
+
+    def mark_sent(self, row):
+        with self._lock:
+            self._conn.execute("DELETE FROM outbox WHERE id = ?", (row["id"],))
+            self._conn.commit()
+        for path in (row["image_path"], row["clip_path"]):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    def mark_retry(self, row, error, next_attempt_at):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (next_attempt_at, str(error), row["id"]),
+            )
+            self._conn.commit()
+
+    def mark_failed(self, row, error):
+        """Park a row the backend will never accept; its frame stays in the spool."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'failed', attempts = attempts + 1, last_error = ? WHERE id = ?",
+                (str(error), row["id"]),
+            )
+            self._conn.commit()
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class OutboxSender:
+    """
+    Drains the outbox in order: upload the spooled frame and event clip (once),
+    then POST the alert. Failures back off exponentially with jitter and block
+    later rows, so alerts reach the backend in the order they were detected.
+    A row whose clip is still recording is held for at most `clip_wait` seconds.
+    The clip is best-effort: after `max_clip_attempts` failed uploads the
+    alert is posted with its image only. `log(message)` reports failures.
+    """
+
+    def __init__(self, outbox, upload, post, base_delay=2.0, max_delay=300.0, poll_timeout=1.0,
+                 upload_clip=None, clip_wait=15.0, max_clip_attempts=3, log=print):
+        self.outbox = outbox
+        self.upload = upload            # upload(image_path) -> image_url
+        self.post = post                # post(payload) -> None, raises on failure
+        self.upload_clip = upload_clip  # upload_clip(clip_path) -> clip_url
+        self.clip_wait = clip_wait
+        self.max_clip_attempts = max_clip_attempts
+        self.log = log
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_timeout = poll_timeout
+        self.sent = 0
+        self.retries = 0
+        self.failed = 0
+        self.clips_dropped = 0
+
+    def _backoff(self, attempts):
+        delay = min(self.max_delay, self.base_delay * (2 ** attempts))
+        return delay * random.uniform(0.5, 1.0)
+
+    def step(self):
+        """Deliver at most one row; used as a StageWorker handler."""
+        row = self.outbox.next_pending()
+        wait = self.poll_timeout
+        if row is not None:
+            due = row["next_attempt_at"]
+            if row["clip_state"] == "recording":
+                due = max(due, row["created_at"] + self.clip_wait)
+            wait = min(wait, max(0.0, due - time.time()))
+        if row is None or wait > 0:
+            self.outbox.wakeup.wait(wait)
+            self.outbox.wakeup.clear()
+            return
+
+        try:
+            image_url = row["image_url"]
+            if image_url is None and row["image_path"]:
+                image_url = self.upload(row["image_path"])
+                self.outbox.set_image_url(row["id"], image_url)
+
+            clip_url = row["clip_url"]
+            if clip_url is None and row["clip_path"] and self.upload_clip is not None:
+                clip_url = self._upload_clip(row)
+
+            payload = dict(row["payload"], image_url=image_url)
+            if clip_url:
+                payload["clip_url"] = clip_url
+            self.post(payload)
+        except PermanentDeliveryError as e:
+            self.failed += 1
+            self.outbox.mark_failed(row, e)
+            self.log(f"❌ Outbox #{row['id']} rejected: {e}")
+        except Exception as e:
+            self.retries += 1
+            delay = self._backoff(row["attempts"])
+            self.outbox.mark_retry(row, e, time.time() + delay)
+            self.log(f"⚠️ Outbox #{row['id']} attempt {row['attempts'] + 1} failed ({e}), retrying in {delay:.0f}s")
+        else:
+            self.sent += 1
+            self.outbox.mark_sent(row)
+
+    def _upload_clip(self, row):
+        """Clip URL, or None once the clip has failed `max_clip_attempts` times. Raises to retry."""
+        try:
+            clip_url = self.upload_clip(row["clip_path"])
+        except Exception as e:
+            if row["clip_attempts"] + 1 < self.max_clip_attempts:
+                self.outbox.mark_clip_failed(row["id"])
+                raise
+            self.clips_dropped += 1
+            self.outbox.drop_clip(row)
+            row["clip_path"] = None
+            self.log(f"⚠️ Outbox #{row['id']} clip failed {row['clip_attempts'] + 1} time(s) ({e}), sending without it")
+            return None
+        self.outbox.set_clip_url(row["id"], clip_url)
+        return clip_url
+
+    def summary(self):
+        counts = self.outbox.counts()
+        return (f"{counts.get('pending', 0)} pending, {counts.get('failed', 0)} failed, "
+                f"{self.sent} sent, {self.retries} retries, {self.clips_dropped} clips dropped this run")
@@ -0,0 +1,130 @@
+# detector/pipeline.py
+import threading
+import time
+from collections import deque
+
+
+class DropOldestQueue:
+    """
+    Bounded hand-off between two stages.
+    When full, put() discards the oldest item instead of blocking the producer,
+    so the consumer always sees the newest data. With maxsize=None nothing is
+    ever dropped (for items that must not be lost, like alerts).
+    """
+
+    def __init__(self, name, maxsize=1):
+        self.name = name
+        self.maxsize = maxsize
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self.maxsize is not None and len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self.put_count += 1
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Return the next item, or None on timeout / after close()."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self._closed, timeout)
+            if self._items:
+                return self._items.popleft()
+            return None
+
+    def get_nowait(self):
+        with self._cond:
+            if self._items:
+                return self._items.popleft()
+            return None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def depth(self):
+        with self._cond:
+            return len(self._items)
+
+    def stats(self):
+        return {
+            "depth": self.depth(),
+            "maxsize": self.maxsize,
+            "put": self.put_count,
+            "dropped": self.dropped,
+        }
+
+
+class StageWorker(threading.Thread):
+    """
+    Runs `handler` in its own thread until `stop_event` is set.
+    If `source` is given, each item taken from it is passed to the handler;
+    otherwise the handler is called in a loop (e.g. a capture stage).
+    A handler returning False ends this worker; with `critical=True` it also
+    sets `stop_event` so the whole pipeline shuts down. Handler errors are
+    reported through `log(message)`.
+    """
+
+    def __init__(self, name, handler, stop_event, source=None, poll_timeout=0.5, critical=True, log=print):
+        super().__init__(name=name, daemon=True)
+        self.log = log
+        self.handler = handler
+        self.stop_event = stop_event
+        self.source = source
+        self.critical = critical
+        self.poll_timeout = poll_timeout
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+
+    def run(self):
+        while not self.stop_event.is_set():
+            if self.source is not None:
+                item = self.source.get(timeout=self.poll_timeout)
+                if item is None:
+                    continue
+                args = (item,)
+            else:
+                args = ()
+
+            start = time.perf_counter()
+            try:
+                keep_going = self.handler(*args)
+            except Exception as e:
+                self.errors += 1
+                self.log(f"❌ [{self.name}] {type(e).__name__}: {e}")
+                keep_going = True
+            self.busy_seconds += time.perf_counter() - start
+            self.processed += 1
+
+            if keep_going is False:
+                if self.critical:
+                    self.stop_event.set()
+                break
+
+    def stats(self):
+        avg_ms = (self.busy_seconds / self.processed * 1000) if self.processed else 0.0
+        return {
+            "processed": self.processed,
+            "errors": self.errors,
+            "avg_ms": avg_ms,
+        }
+
+
+def format_pipeline_stats(workers, queues):
+    """One-line summary of every stage, used to spot the bottleneck."""
+    parts = []
+    for worker in workers:
+        s = worker.stats()
+        parts.append(f"{worker.name}: {s['processed']} done, {s['avg_ms']:.1f}ms avg, {s['errors']} err")
+    for q in queues:
+        s = q.stats()
+        parts.append(f"{q.name}: depth {s['depth']}/{s['maxsize'] or '∞'}, dropped {s['dropped']}/{s['put']}")
+    return " | ".join(parts)
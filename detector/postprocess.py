@@ -0,0 +1,75 @@
+# detector/postprocess.py
+import numpy as np
+
+_name_tables = {}
+
+
+def _class_names(names):
+    """Cached array version of a YOLO `names` dict so ids map to names in one indexing op."""
+    key = id(names)
+    table = _name_tables.get(key)
+    if table is None or len(table) != len(names):
+        table = np.array([names[i] for i in range(len(names))], dtype=object)
+        _name_tables[key] = table
+    return table
+
+
+def empty_detections():
+    return {
+        "class": np.empty(0, dtype=object),
+        "conf": np.empty(0, dtype=np.float32),
+        "bbox": np.empty((0, 4), dtype=np.float32),
+    }
+
+
+def extract_detections(result, conf_threshold):
+    """
+    Pull class, confidence and normalized xyxy for every box as whole arrays
+    (one device->host copy each) and keep the ones above `conf_threshold`.
+    Returns {"class": (N,) names, "conf": (N,), "bbox": (N, 4)}.
+    """
+    boxes = result.boxes
+    if boxes is None or len(boxes) == 0:
+        return empty_detections()
+
+    cls = boxes.cls.cpu().numpy().astype(np.int64)
+    conf = boxes.conf.cpu().numpy()
+    bbox = boxes.xyxyn.cpu().numpy()
+
+    keep = conf >= conf_threshold
+    return {
+        "class": _class_names(result.names)[cls[keep]],
+        "conf": conf[keep],
+        "bbox": bbox[keep],
+    }
+
+
+def box_centers(boxes):
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1)
+
+
+def pairwise_center_distances(boxes_a, boxes_b):
+    """(N, M) matrix of distances between box centers."""
+    diff = box_centers(boxes_a)[:, None, :] - box_centers(boxes_b)[None, :, :]
+    return np.sqrt((diff ** 2).sum(axis=2))
+
+
+def pairwise_iou(boxes_a, boxes_b):
+    """(N, M) IoU matrix for two sets of xyxy boxes."""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+
+    iou = np.zeros_like(inter)
+    np.divide(inter, union, out=iou, where=union > 0)
+    return iou
@@ -0,0 +1,96 @@
+# detector/roi.py
+import cv2
+import numpy as np
+
+from detector.postprocess import empty_detections, pairwise_iou
+
+ROI_COLOR = (0, 200, 255)
+BOX_COLOR = (0, 255, 0)
+
+
+def parse_rois(value):
+    """
+    Parse per-camera regions of interest, e.g.
+    "cam0=0,0.55,1,0.85;cam0=0.6,0.1,0.9,0.4;cam1=0.25,0.3,0.75,1".
+    Coordinates are normalized x1,y1,x2,y2; a camera may have several regions.
+    Returns {camera_id: (K, 4) float32 array}.
+    """
+    rois = {}
+    for item in (value or "").split(";"):
+        item = item.strip()
+        if not item:
+            continue
+        camera_id, _, coords = item.partition("=")
+        box = [float(v) for v in coords.split(",")]
+        if len(box) != 4:
+            raise ValueError(f"ROI '{item}' needs four values: x1,y1,x2,y2")
+        x1, y1, x2, y2 = np.clip(box, 0.0, 1.0)
+        if x2 <= x1 or y2 <= y1:
+            raise ValueError(f"ROI '{item}' is empty")
+        rois.setdefault(camera_id.strip(), []).append((x1, y1, x2, y2))
+    return {camera_id: np.array(boxes, dtype=np.float32) for camera_id, boxes in rois.items()}
+
+
+def roi_pixels(rois, shape):
+    """Pixel bounds (K, 4) of normalized `rois` on a frame of `shape`."""
+    h, w = shape[:2]
+    scale = np.array([w, h, w, h], dtype=np.float32)
+    pixels = np.rint(rois * scale).astype(np.int64)
+    # Never produce an empty crop, however thin the strip
+    pixels[:, 2] = np.maximum(pixels[:, 2], pixels[:, 0] + 1)
+    pixels[:, 3] = np.maximum(pixels[:, 3], pixels[:, 1] + 1)
+    return pixels
+
+
+def crop_regions(frame, rois):
+    """Crops (views, no copy) of every region, in `rois` order."""
+    return [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in roi_pixels(rois, frame.shape)]
+
+
+def merge_roi_detections(crop_detections, rois, shape, duplicate_iou=0.5):
+    """
+    Map detections from each crop (normalized to the crop) back to
+    full-frame normalized xyxy and drop duplicates where regions overlap,
+    keeping the most confident box of each class.
+    """
+    h, w = shape[:2]
+    pixels = roi_pixels(rois, shape).astype(np.float32)
+    parts = []
+    for detections, (x1, y1, x2, y2) in zip(crop_detections, pixels):
+        if len(detections["class"]) == 0:
+            continue
+        bbox = detections["bbox"] * np.array([x2 - x1, y2 - y1, x2 - x1, y2 - y1], dtype=np.float32)
+        bbox += np.array([x1, y1, x1, y1], dtype=np.float32)
+        bbox /= np.array([w, h, w, h], dtype=np.float32)
+        parts.append({"class": detections["class"], "conf": detections["conf"], "bbox": bbox})
+
+    if not parts:
+        return empty_detections()
+    merged = {key: np.concatenate([p[key] for p in parts]) for key in ("class", "conf", "bbox")}
+    if len(parts) == 1:
+        return merged
+
+    order = np.argsort(-merged["conf"], kind="stable")
+    merged = {key: value[order] for key, value in merged.items()}
+    same = (merged["class"][:, None] == merged["class"][None, :]) & (
+        pairwise_iou(merged["bbox"], merged["bbox"]) > duplicate_iou)
+    keep = np.ones(len(order), dtype=bool)
+    for i in range(len(order)):
+        if keep[i]:
+            keep[i + 1:] &= ~same[i, i + 1:]
+    return {key: value[keep] for key, value in merged.items()}
+
+
+def draw_detections(frame, detections, rois):
+    """Annotated copy of the full frame: ROI outlines plus the merged boxes."""
+    annotated = frame.copy()
+    h, w = frame.shape[:2]
+    for x1, y1, x2, y2 in roi_pixels(rois, frame.shape):
+        cv2.rectangle(annotated, (int(x1), int(y1)), (int(x2), int(y2)), ROI_COLOR, 1)
+    scale = np.array([w, h, w, h], dtype=np.float32)
+    for name, conf, box in zip(detections["class"], detections["conf"], detections["bbox"]):
+        x1, y1, x2, y2 = (box * scale).astype(int)
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), BOX_COLOR, 2)
+        cv2.putText(annotated, f"{name} {conf:.2f}", (x1, max(12, y1 - 4)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, BOX_COLOR, 1, cv2.LINE_AA)
+    return annotated
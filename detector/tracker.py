@@ -0,0 +1,115 @@
+# detector/tracker.py
+import itertools
+import time
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from detector.postprocess import pairwise_iou
+
+# Boxes arrive normalized (0-1); the filter works in a virtual 1000px frame
+# so the SORT noise settings below keep their usual meaning.
+_SCALE = 1000.0
+
+_F = np.eye(7)
+_F[0, 4] = _F[1, 5] = _F[2, 6] = 1
+_H = np.eye(4, 7)
+_R = np.diag([1.0, 1.0, 10.0, 10.0])
+_Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001])
+
+
+def _to_z(bbox):
+    """xyxy -> [center x, center y, area, aspect ratio]"""
+    x1, y1, x2, y2 = np.asarray(bbox, dtype=np.float64) * _SCALE
+    w, h = x2 - x1, y2 - y1
+    return np.array([x1 + w / 2, y1 + h / 2, w * h, w / max(h, 1e-6)])
+
+
+def _to_bbox(x):
+    area, ratio = max(x[2], 1e-6), max(x[3], 1e-6)
+    w = np.sqrt(area * ratio)
+    h = area / max(w, 1e-6)
+    return np.array([x[0] - w / 2, x[1] - h / 2, x[0] + w / 2, x[1] + h / 2]) / _SCALE
+
+
+class KalmanBoxTrack:
+    """Constant-velocity Kalman filter for one tracked box (as in SORT)."""
+
+    def __init__(self, track_id, bbox, class_name, now):
+        self.id = track_id
+        self.class_name = class_name
+        self.x = np.zeros(7)
+        self.x[:4] = _to_z(bbox)
+        self.P = np.diag([10.0, 10.0, 10.0, 10.0, 1e4, 1e4, 1e4])
+        self.hits = 1
+        self.first_seen = now
+        self.last_seen = now
+
+    def predict(self):
+        if self.x[2] + self.x[6] <= 0:
+            self.x[6] = 0.0
+        self.x = _F @ self.x
+        self.P = _F @ self.P @ _F.T + _Q
+        return _to_bbox(self.x)
+
+    def update(self, bbox, now):
+        y = _to_z(bbox) - _H @ self.x
+        S = _H @ self.P @ _H.T + _R
+        K = self.P @ _H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ y
+        self.P = (np.eye(7) - K @ _H) @ self.P
+        self.hits += 1
+        self.last_seen = now
+
+    def bbox(self):
+        return _to_bbox(self.x)
+
+
+class Tracker:
+    """
+    SORT-style multi-object tracker.
+    Detections are matched to predicted track boxes of the same class by IoU
+    (Hungarian assignment); unmatched detections start new tracks, and tracks
+    unseen for `max_age` seconds are dropped.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_age=3.0):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def update(self, detections, now=None):
+        """Return the track id for every detection, in detection order."""
+        now = time.time() if now is None else now
+        names = detections['class']
+        boxes = detections['bbox']
+        track_ids = np.zeros(len(names), dtype=np.int64)
+
+        self.tracks = [t for t in self.tracks if now - t.last_seen <= self.max_age]
+        predicted = np.array([t.predict() for t in self.tracks]).reshape(-1, 4)
+
+        matched_dets = set()
+        if len(self.tracks) and len(names):
+            track_names = np.array([t.class_name for t in self.tracks], dtype=object)
+            iou = pairwise_iou(boxes, predicted)
+            iou[names[:, None] != track_names[None, :]] = 0.0
+
+            for d, t in zip(*linear_sum_assignment(-iou)):
+                if iou[d, t] < self.iou_threshold:
+                    continue
+                track = self.tracks[t]
+                track.update(boxes[d], now)
+                track_ids[d] = track.id
+                matched_dets.add(d)
+
+        for d in range(len(names)):
+            if d not in matched_dets:
+                track = KalmanBoxTrack(next(self._ids), boxes[d], names[d], now)
+                self.tracks.append(track)
+                track_ids[d] = track.id
+
+        return track_ids
+
+    def active_ids(self):
+        return {t.id for t in self.tracks}
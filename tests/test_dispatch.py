@@ -0,0 +1,95 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+
+from backend import dispatch
+from backend.dispatch import NotificationDispatcher
+from backend.onesignal import CircuitOpenError
+
+ALERT_ID = "65f000000000000000000001"
+
+
+def deliver(dispatcher, send, monkeypatch):
+    """Run one job through _deliver; returns the recorded (status, fields) steps and the sleeps."""
+    steps, sleeps = [], []
+    clock = [1000.0]
+
+    async def set_status(alert_ids, status, **fields):
+        steps.append((status, fields))
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+        clock[0] += delay
+
+    monkeypatch.setattr(dispatcher, "_set_status", set_status)
+    monkeypatch.setattr(dispatch.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(dispatch, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    asyncio.run(dispatcher._deliver({"alert_ids": [ALERT_ID], "send": send, "notification": {}}))
+    return steps, sleeps
+
+
+def test_open_circuit_waits_without_using_up_the_job(monkeypatch):
+    outcomes = [CircuitOpenError("open", retry_after=25.0)] * 5
+
+    async def send():
+        if outcomes:
+            raise outcomes.pop(0)
+        return {"id": "n1", "recipients": 2}
+
+    steps, sleeps = deliver(NotificationDispatcher(max_wait=600), send, monkeypatch)
+
+    assert sleeps == [25.0] * 5
+    assert steps[-1] == ("sent", {"attempts": 1, "recipients": 2, "onesignal_id": "n1"})
+
+
+def test_rejected_request_is_dead_lettered_without_retry(monkeypatch):
+    calls = []
+
+    async def send():
+        calls.append(1)
+        request = httpx.Request("POST", "https://onesignal.test")
+        raise httpx.HTTPStatusError("bad", request=request, response=httpx.Response(400, request=request))
+
+    steps, sleeps = deliver(NotificationDispatcher(), send, monkeypatch)
+
+    assert len(calls) == 1
+    assert sleeps == []
+    assert [status for status, _ in steps] == ["dead_letter"]
+
+
+def test_unavailable_provider_waits_for_reset_window_until_max_wait(monkeypatch):
+    async def send():
+        raise httpx.ConnectError("connection refused")
+
+    monkeypatch.setattr(dispatch.onesignal, "reset_timeout", 30.0)
+    steps, sleeps = deliver(NotificationDispatcher(max_wait=100), send, monkeypatch)
+
+    # Each try already went through the client's retries; between tries the job waits for the breaker
+    assert sleeps == [30.0, 30.0, 30.0]
+    assert steps[-1][0] == "dead_letter"
+
+
+def test_stop_dead_letters_queued_and_in_flight_jobs(monkeypatch):
+    steps = []
+
+    async def set_status(alert_ids, status, **fields):
+        steps.append((alert_ids, status, fields.get("last_error")))
+
+    async def send():
+        await asyncio.Event().wait()  # OneSignal never answers
+
+    async def run():
+        dispatcher = NotificationDispatcher(concurrency=1)
+        monkeypatch.setattr(dispatcher, "_set_status", set_status)
+        await dispatcher.submit("65f000000000000000000001", send=send)
+        await dispatcher.submit("65f000000000000000000002", send=send)
+        await asyncio.sleep(0.01)
+        await dispatcher.stop(timeout=0.05)
+
+    asyncio.run(run())
+
+    assert sorted(steps) == [
+        (["65f000000000000000000001"], "dead_letter", "backend stopped before delivery"),
+        (["65f000000000000000000002"], "dead_letter", "backend stopped before delivery"),
+    ]
@@ -0,0 +1,180 @@
+import asyncio
+
+import httpx
+import pytest
+
+from backend import onesignal
+from backend.onesignal import CircuitOpenError, OneSignalClient
+
+PAYLOAD = {"app_id": "test", "contents": {"en": "🐘 ELEPHANT detected"}}
+HEADERS = {"Authorization": "Basic test"}
+
+
+class FakeOneSignal:
+    """Local stand-in for the OneSignal API: answers with the queued responses, then 200."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def __call__(self, request):
+        self.calls += 1
+        if self.responses:
+            response = self.responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+        return httpx.Response(200, json={"id": f"n{self.calls}", "recipients": 1})
+
+
+def post(client, fake):
+    async def run():
+        await client.start(transport=httpx.MockTransport(fake))
+        try:
+            return await client.post(PAYLOAD, HEADERS)
+        finally:
+            await client.aclose()
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record backoff delays instead of waiting them out."""
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(onesignal.asyncio, "sleep", fake_sleep)
+    return delays
+
+
+def test_429_waits_for_retry_after(sleeps):
+    fake = FakeOneSignal(httpx.Response(429, headers={"Retry-After": "7"}))
+    result = post(OneSignalClient(base_delay=0.1), fake)
+
+    assert result["id"] == "n2"
+    assert fake.calls == 2
+    assert sleeps[0] >= 7
+
+
+def test_5xx_and_network_errors_are_retried(sleeps):
+    fake = FakeOneSignal(
+        httpx.Response(503),
+        httpx.ConnectError("connection refused"),
+        httpx.Response(502),
+    )
+    result = post(OneSignalClient(max_retries=3), fake)
+
+    assert result["recipients"] == 1
+    assert fake.calls == 4
+    assert len(sleeps) == 3
+
+
+def test_gives_up_after_max_retries(sleeps):
+    fake = FakeOneSignal(*[httpx.Response(500)] * 5)
+    with pytest.raises(httpx.HTTPStatusError) as error:
+        post(OneSignalClient(max_retries=2), fake)
+
+    assert error.value.response.status_code == 500
+    assert not onesignal.is_permanent(error.value)
+    assert fake.calls == 3
+
+
+def test_4xx_is_passed_through_without_retry(sleeps):
+    fake = FakeOneSignal(httpx.Response(400, json={"errors": ["invalid player ids"]}))
+    client = OneSignalClient()
+    with pytest.raises(httpx.HTTPStatusError) as error:
+        post(client, fake)
+
+    assert error.value.response.status_code == 400
+    assert onesignal.is_permanent(error.value)
+    assert fake.calls == 1
+    assert sleeps == []
+    assert client.state == "closed"  # a bad request says nothing about the provider
+
+
+def test_circuit_opens_half_opens_and_closes():
+    fake = FakeOneSignal(*[httpx.Response(503)] * 2)
+    client = OneSignalClient(max_retries=0, failure_threshold=2, reset_timeout=0.2)
+
+    async def run():
+        await client.start(transport=httpx.MockTransport(fake))
+        try:
+            for _ in range(2):
+                with pytest.raises(httpx.HTTPStatusError):
+                    await client.post(PAYLOAD, HEADERS)
+            assert client.state == "open"
+
+            # Open: fail fast without touching the provider
+            with pytest.raises(CircuitOpenError) as error:
+                await client.post(PAYLOAD, HEADERS)
+            assert 0 < error.value.retry_after <= 0.2
+            assert fake.calls == 2
+
+            await asyncio.sleep(0.25)
+            assert client.state == "half-open"
+
+            # Half-open: one trial call, which succeeds and closes the circuit
+            result = await client.post(PAYLOAD, HEADERS)
+            assert result["id"] == "n3"
+            assert client.state == "closed"
+            assert client.retry_after == 0
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_failed_trial_reopens_circuit():
+    fake = FakeOneSignal(*[httpx.Response(503)] * 2)
+    client = OneSignalClient(max_retries=0, failure_threshold=1, reset_timeout=0.1)
+
+    async def run():
+        await client.start(transport=httpx.MockTransport(fake))
+        try:
+            with pytest.raises(httpx.HTTPStatusError):
+                await client.post(PAYLOAD, HEADERS)
+            await asyncio.sleep(0.15)
+            assert client.state == "half-open"
+            with pytest.raises(httpx.HTTPStatusError):
+                await client.post(PAYLOAD, HEADERS)
+            assert client.state == "open"
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_unexpected_trial_error_does_not_wedge_the_circuit():
+    fake = FakeOneSignal(httpx.Response(503), ValueError("unexpected"))
+    client = OneSignalClient(max_retries=0, failure_threshold=1, reset_timeout=0.1)
+
+    async def run():
+        await client.start(transport=httpx.MockTransport(fake))
+        try:
+            with pytest.raises(httpx.HTTPStatusError):
+                await client.post(PAYLOAD, HEADERS)
+            await asyncio.sleep(0.15)
+
+            # The trial fails with something other than an HTTP or network error
+            with pytest.raises(ValueError):
+                await client.post(PAYLOAD, HEADERS)
+            assert client.state == "open"
+
+            await asyncio.sleep(0.15)
+            result = await client.post(PAYLOAD, HEADERS)
+            assert result["id"] == "n3"
+            assert client.state == "closed"
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_decoding_errors_are_retried(sleeps):
+    fake = FakeOneSignal(httpx.DecodingError("bad gzip"))
+    result = post(OneSignalClient(), fake)
+
+    assert result["id"] == "n2"
+    assert fake.calls == 2
@@ -1,12 +1,24 @@
 import cv2
-from ultralytics import YOLO
 import cloudinary
 import cloudinary.uploader
 import requests
 from datetime import datetime
 import os, time
+import argparse
+import threading
 import numpy as np
 from dotenv import load_dotenv
+from detector.pipeline import DropOldestQueue, StageWorker, format_pipeline_stats
+from detector.cameras import Camera, parse_sources, collect_latest
+from detector.motion import MotionGate
+from detector.cadence import CadenceController
+from detector.outbox import Outbox, OutboxSender, PermanentDeliveryError
+from detector.backends import BACKENDS, select_backend
+from detector.metrics import ALERTS, DELIVERIES, FRAMES, STAGE_SECONDS, timed, start_metrics_server, watch_cadence, watch_outbox, watch_queues
+from detector.postprocess import extract_detections, pairwise_center_distances, pairwise_iou
+from detector.logwriter import LogWriter
+from detector.roi import draw_detections, merge_roi_detections, parse_rois
+from detector.clips import ClipRecorder
 
 print("🐍 Detection script started")
 
@@ -14,7 +26,15 @@ print("🐍 Detection script started")
 load_dotenv()
 API_BASE = os.getenv("API_BASE_URL", "http://127.0.0.1:8000")
 TOKEN = os.getenv("API_TOKEN")
+CAMERA_SOURCES = os.getenv("CAMERA_SOURCES", "0")  # e.g. "0,rtsp://10.0.0.5/stream"
+CAMERA_ROIS = os.getenv("CAMERA_ROIS", "")  # e.g. "cam0=0,0.55,1,0.85;cam1=0.25,0.3,0.75,1"
+HEADLESS = os.getenv("HEADLESS", "").lower() in ("1", "true", "yes")
+ANNOTATED_BUS = os.getenv("ANNOTATED_BUS")  # e.g. "wildcam-annotated", read by camera_stream.py
+MODEL_PATH = os.getenv("MODEL_PATH") or "C:\\Users\\naren\\wild_animal_detection\\best (4).pt"  # empty counts as unset
+MODEL_BACKEND = os.getenv("MODEL_BACKEND") or "auto"  # auto, torch, onnx, openvino, openvino-int8
 CONF_THRESHOLD = 0.48
+HUMAN_PROXIMITY_THRESHOLD = 150  # You can tune this threshold
+DUPLICATE_IOU = 0.7              # Same animal in the same position
 
 # Smart cooldown system
 COOLDOWN_CONFIG = {
@@ -43,109 +63,116 @@ cloudinary.config(
     api_secret=os.getenv("CLOUDINARY_API_SECRET")
 )
 
-# Load YOLO model
-model = YOLO("C:\\Users\\naren\\wild_animal_detection\\best (4).pt")
-
-# Webcam
-cap = cv2.VideoCapture(0)
-
-# Track last alert times and locations
-last_alert_data = {}  # {class_name: {'time': timestamp, 'bbox': bbox}}
-
-# Open log file
-log_file = open("detections.log", "a", encoding="utf-8")
-
-
-def log(message: str):
-    """Write timestamped log message to file and console."""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    line = f"[{timestamp}] {message}"
-    print(line)
-    log_file.write(line + "\n")
-    log_file.flush()
-
-
-def calculate_bbox_similarity(bbox1, bbox2):
+# Pipeline tuning
+MOTION_THRESHOLD = 0.01     # Fraction of changed pixels needed to run the model
+MOTION_KEEPALIVE = 30       # Seconds between inferences on a static scene
+INFERENCE_CPU_BUDGET = 0.5  # Share of wall time the model may use normally
+THREAT_CPU_BUDGET = 0.9     # ...while a HIGH/CRITICAL animal is in view
+IDLE_INTERVAL = 1.0         # Max one inference per second on an empty scene
+OUTBOX_DB = os.getenv("OUTBOX_DB", "outbox.db")
+OUTBOX_DIR = os.getenv("OUTBOX_DIR", "outbox_spool")
+HTTP_TIMEOUT = 10           # Seconds per Cloudinary/backend request
+CLIP_PRE_SECONDS = 5        # Event clip: seconds kept before the alert...
+CLIP_POST_SECONDS = 3       # ...and recorded after it (both 0 disables clips)
+CLIP_FPS = 8
+CLIP_ENCODE_MARGIN = 10     # Extra seconds an alert waits for its clip after the post-roll
+CLIP_WIDTH = 640
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9101"))  # Prometheus /metrics, 0 disables
+STATS_INTERVAL = 30         # Seconds between pipeline stats log lines
+LOG_PATH = os.getenv("LOG_PATH", "detections.log")  # JSON lines, rotated to detections.log.1..5
+LOG_SUMMARY_WINDOW = 60     # Repeated messages collapse into one summary per window
+
+# Track last alert times and locations per tracked animal, separately for every camera
+last_alert_data = {}  # {camera_id: {track_id: {'class': name, 'time': timestamp, 'bbox': bbox}}}
+
+# One keep-alive session for every backend call
+http_session = requests.Session()
+
+# Log file is written by a background thread
+log_writer = LogWriter(LOG_PATH, summary_window=LOG_SUMMARY_WINDOW)
+
+
+def log(message: str, key=None, **fields):
     """
-    Calculate if two bounding boxes are similar (same animal in same position)
-    Returns similarity score 0-1
+    Queue a log line for the console and the JSON log file.
+    Lines sharing a `key` are collapsed into one summary per LOG_SUMMARY_WINDOW.
     """
-    if bbox1 is None or bbox2 is None:
-        return 0
-    
-    # Calculate IoU (Intersection over Union)
-    x1_inter = max(bbox1[0], bbox2[0])
-    y1_inter = max(bbox1[1], bbox2[1])
-    x2_inter = min(bbox1[2], bbox2[2])
-    y2_inter = min(bbox1[3], bbox2[3])
-    
-    inter_area = max(0, x2_inter - x1_inter) * max(0, y2_inter - y1_inter)
-    
-    bbox1_area = (bbox1[2] - bbox1[0]) * (bbox1[3] - bbox1[1])
-    bbox2_area = (bbox2[2] - bbox2[0]) * (bbox2[3] - bbox2[1])
-    
-    union_area = bbox1_area + bbox2_area - inter_area
-    
-    if union_area == 0:
-        return 0
-    
-    return inter_area / union_area
+    log_writer.write(message, key=key, **fields)
 
 
-def check_proximity(animal_bbox, person_bbox, threshold=150):
+def should_send_alert(detections, alert_levels, camera_id="cam0", now=None):
     """
-    Check if person is dangerously close to animal
-    Returns distance in pixels
+    Smart decision for every detection in a frame at once: send alert or skip?
+    Suppress alert if human is nearby. Otherwise alert once per track:
+    a track that already alerted stays quiet until its cooldown runs out, and
+    a new track on top of a recently alerted one (the same animal picked up
+    again after the tracker lost it) inherits that alert instead of sending a new one.
+    `now` defaults to the wall clock; replays pass the footage time.
+    Returns a boolean mask over `detections`.
     """
-    # Calculate center points
-    animal_center = np.array([
-        (animal_bbox[0] + animal_bbox[2]) / 2,
-        (animal_bbox[1] + animal_bbox[3]) / 2
-    ])
-    person_center = np.array([
-        (person_bbox[0] + person_bbox[2]) / 2,
-        (person_bbox[1] + person_bbox[3]) / 2
-    ])
-    
-    distance = np.linalg.norm(animal_center - person_center)
-    return distance
+    now = time.time() if now is None else now
+    names = detections['class']
+    boxes = detections['bbox']
+    track_ids = detections['track_id']
+    camera_alerts = last_alert_data.setdefault(camera_id, {})
+
+    # Forget tracks that are gone and whose longest cooldown has passed
+    max_cooldown = max(COOLDOWN_CONFIG.values())
+    for track_id in [t for t, a in camera_alerts.items() if now - a['time'] > max_cooldown]:
+        if track_id not in track_ids:
+            del camera_alerts[track_id]
+
+    is_human = names == "human"
+    send = ~is_human
+    if not send.any():
+        return send
+
+    # Check for nearby humans: every animal against every human in one matrix
+    if is_human.any():
+        nearest = pairwise_center_distances(boxes, boxes[is_human]).min(axis=1)
+        near_human = send & (nearest < HUMAN_PROXIMITY_THRESHOLD)
+        for i in np.flatnonzero(near_human):
+            log(f"🧍‍♂️ [{camera_id}] Human near {names[i]} (distance={nearest[i]:.1f}) – alert suppressed",
+                key=f"{camera_id}:human_near:{names[i]}", camera=camera_id, animal=names[i])
+        send &= ~near_human
+
+    cooldowns = np.array([COOLDOWN_CONFIG.get(level, 300) for level in alert_levels])
+
+    # Check cooldown logic for tracks that already alerted
+    known = np.array([t in camera_alerts for t in track_ids], dtype=bool)
+    for i in np.flatnonzero(send & known):
+        previous = camera_alerts[track_ids[i]]
+        time_since_last = now - previous['time']
+        if time_since_last < cooldowns[i]:
+            send[i] = False
+        else:
+            log(f"🔁 [{camera_id}] {names[i]} #{track_ids[i]} still present after {time_since_last:.0f}s")
 
+    # New tracks: IoU against recently alerted tracks that are not in this frame
+    new = send & ~known
+    lost = [t for t in camera_alerts if t not in track_ids]
+    if new.any() and lost:
+        previous = [camera_alerts[t] for t in lost]
+        prev_names = np.array([p['class'] for p in previous], dtype=object)
+        prev_boxes = np.stack([p['bbox'] for p in previous])
+        prev_age = now - np.array([p['time'] for p in previous])
 
-def should_send_alert(class_name, bbox, alert_level, current_detections):
-    """
-    Smart decision: should we send alert or skip?
-    Suppress alert if human is nearby.
-    """
-    now = time.time()
-    cooldown = COOLDOWN_CONFIG.get(alert_level, 300)
-
-    # Check for nearby humans
-    for detection in current_detections:
-        if detection['class'] == 'human':
-            human_bbox = detection['bbox']
-            proximity = check_proximity(bbox, human_bbox)
-            if proximity < 150:  # You can tune this threshold
-                log(f"🧍‍♂️ Human near {class_name} (distance={proximity:.1f}) – alert suppressed")
-                return False
+        recent = (names[:, None] == prev_names[None, :]) & (prev_age[None, :] < cooldowns[:, None])
+        similar = new[:, None] & recent & (pairwise_iou(boxes, prev_boxes) > DUPLICATE_IOU)
 
-    # Check cooldown logic
-    if class_name in last_alert_data:
-        time_since_last = now - last_alert_data[class_name]['time']
-        last_bbox = last_alert_data[class_name]['bbox']
+        for i in np.flatnonzero(similar.any(axis=1)):
+            j = np.flatnonzero(similar[i])[np.argmin(prev_age[similar[i]])]
+            log(f"⏭️ [{camera_id}] Skipping duplicate {names[i]} #{track_ids[i]} "
+                f"(same position as #{lost[j]}, {prev_age[j]:.0f}s ago)",
+                key=f"{camera_id}:duplicate:{names[i]}", camera=camera_id, animal=names[i])
+            camera_alerts[int(track_ids[i])] = dict(previous[j])
+            send[i] = False
 
-        if time_since_last < cooldown:
-            similarity = calculate_bbox_similarity(bbox, last_bbox)
-            if similarity > 0.7:
-                log(f"⏭️ Skipping duplicate {class_name} (same position, {time_since_last:.0f}s ago)")
-                return False
-            else:
-                log(f"🆕 New {class_name} detected (different position)")
-                return True
-        else:
-            return True
-    else:
-        return True
+    for i in np.flatnonzero(send & ~known):
+        log(f"🆕 [{camera_id}] New {names[i]} #{track_ids[i]} detected",
+            camera=camera_id, animal=names[i], track_id=int(track_ids[i]))
 
+    return send
 
 
 def get_alert_level(class_name, current_detections):
@@ -154,103 +181,412 @@ def get_alert_level(class_name, current_detections):
     return base_level
 
 
+def alert_payload(job):
+    return {
+        "animal": job['class'],
+        "alert_level": job['alert_level'],
+        "confidence": job['conf'],
+        "camera_id": job['camera_id'],
+        "track_id": job['track_id'],
+        "timestamp": job['timestamp']
+    }
+
+
+def upload_image(image_path):
+    """Upload a spooled frame to Cloudinary. Runs on the outbox sender thread."""
+    try:
+        with timed("upload"):
+            result = cloudinary.uploader.upload(image_path)
+    except Exception:
+        DELIVERIES.labels("upload", "error").inc()
+        raise
+    DELIVERIES.labels("upload", "ok").inc()
+    image_url = result.get("secure_url")
+    log(f"☁️ Uploaded to Cloudinary: {image_url}")
+    return image_url
+
+
+def upload_clip(clip_path):
+    """Upload an encoded event clip to Cloudinary. Runs on the outbox sender thread."""
+    try:
+        with timed("upload_clip"):
+            result = cloudinary.uploader.upload(clip_path, resource_type="video")
+    except Exception:
+        DELIVERIES.labels("upload_clip", "error").inc()
+        raise
+    DELIVERIES.labels("upload_clip", "ok").inc()
+    clip_url = result.get("secure_url")
+    log(f"🎬 Uploaded clip to Cloudinary: {clip_url}")
+    return clip_url
+
+
+def post_alert(payload):
+    """Send one alert to the backend over the shared session. Raises on failure."""
+    headers = {"Authorization": f"Bearer {TOKEN}"}
+    try:
+        with timed("post"):
+            r = http_session.post(f"{API_BASE}/alerts/", json=payload, headers=headers, timeout=HTTP_TIMEOUT)
+    except Exception:
+        DELIVERIES.labels("post", "error").inc()
+        raise
+    DELIVERIES.labels("post", str(r.status_code)).inc()
+    if r.status_code in (400, 404, 405, 413, 422):
+        raise PermanentDeliveryError(f"HTTP {r.status_code}: {r.text[:200]}")
+    r.raise_for_status()
+    log(f"📡 Backend response: {r.json()}")
+
+
+def process_detections(camera_id, frame, detections, alert_queue, now=None):
+    """
+    Run alert decisions for one camera's detections and queue any alerts.
+    Returns the alert levels of the animals seen (humans excluded).
+    """
+    now = time.time() if now is None else now
+    alert_levels = [get_alert_level(name, detections) for name in detections['class']]
+    send = should_send_alert(detections, alert_levels, camera_id, now)
 
-# Main detection loop
-frame_count = 0
-PROCESS_EVERY_N_FRAMES = 5  # Process every 5th frame for efficiency
-
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-    
-    frame_count += 1
-    
-    # Skip frames for efficiency
-    if frame_count % PROCESS_EVERY_N_FRAMES != 0:
-        cv2.imshow("YOLOv8 Live", frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-        continue
-    
-    results = model(frame)
-    annotated_frame = results[0].plot()
-    
-    # Collect all current detections
-    current_detections = []
-    for box in results[0].boxes:
-        cls_id = int(box.cls)
-        class_name = results[0].names[cls_id]
-        conf = float(box.conf)
-        bbox = box.xyxyn[0].cpu().numpy()  # Normalized bbox
-        
-        if conf >= CONF_THRESHOLD:
-            current_detections.append({
-                'class': class_name,
-                'conf': conf,
-                'bbox': bbox
-            })
-    
-    # Process each detection
-    # Process each detection
-    for detection in current_detections:
-        class_name = detection['class']
-        conf = detection['conf']
-        bbox = detection['bbox']
+    for i, class_name in enumerate(detections['class']):
+        conf = float(detections['conf'][i])
+        bbox = detections['bbox'][i]
+        track_id = int(detections['track_id'][i])
+        alert_level = alert_levels[i]
 
         # Skip alert logic for humans
         if class_name == "human":
-            log(f"👤 Human detected (conf={conf:.2f}) – no alert triggered")
+            log(f"👤 [{camera_id}] Human detected (conf={conf:.2f}) – no alert triggered",
+                key=f"{camera_id}:human", camera=camera_id, conf=round(conf, 3))
+            continue
+        if not send[i]:
+            # Keep the last known position of tracks that already alerted
+            if track_id in last_alert_data[camera_id]:
+                last_alert_data[camera_id][track_id]['bbox'] = bbox
             continue
 
-        # Determine alert level
-        alert_level = get_alert_level(class_name, current_detections)
-
-        # Decide if we should alert
-        if should_send_alert(class_name, bbox, alert_level, current_detections):
-            log(f"✅ Detected {class_name} (conf={conf:.2f}, level={alert_level}) – sending alert")
-
-            # Update tracking data
-            last_alert_data[class_name] = {
-                'time': time.time(),
-                'bbox': bbox
-            }
-
-            # Save frame
-            filename = f"detected_{class_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-            cv2.imwrite(filename, frame)
-
-            # Upload to Cloudinary
-            try:
-                result = cloudinary.uploader.upload(filename)
-                image_url = result.get("secure_url")
-                log(f"☁️ Uploaded to Cloudinary: {image_url}")
-                os.remove(filename)
-            except Exception as e:
-                log(f"❌ Cloudinary upload failed: {e}")
-                image_url = None
-
-            # Send to backend
-            if image_url:
-                headers = {"Authorization": f"Bearer {TOKEN}"}
-                payload = {
-                    "animal": class_name,
-                    "image_url": image_url,
-                    "alert_level": alert_level,
-                    "confidence": conf,
-                    "timestamp": datetime.now().isoformat()
-                }
-                try:
-                    r = requests.post(f"{API_BASE}/alerts/", json=payload, headers=headers)
-                    log(f"📡 Backend response: {r.json()}")
-                except Exception as e:
-                    log(f"❌ Backend error: {e}")
-
-    
-    cv2.imshow("YOLOv8 Live", annotated_frame)
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
-
-cap.release()
-cv2.destroyAllWindows()
-log_file.close()
+        log(f"✅ [{camera_id}] Detected {class_name} #{track_id} (conf={conf:.2f}, level={alert_level}) – sending alert",
+            camera=camera_id, animal=class_name, track_id=track_id, conf=round(conf, 3), level=alert_level)
+
+        # Update tracking data
+        last_alert_data[camera_id][track_id] = {
+            'class': class_name,
+            'time': now,
+            'bbox': bbox
+        }
+
+        # The alert worker writes it to the outbox; inference never waits on disk or network
+        alert_queue.put({
+            'camera_id': camera_id,
+            'track_id': track_id,
+            'class': class_name,
+            'conf': conf,
+            'alert_level': alert_level,
+            'frame': frame.copy(),  # the alert keeps its own snapshot of the detected frame
+            'time': now,
+            'timestamp': datetime.fromtimestamp(now).astimezone().isoformat()  # with UTC offset
+        })
+
+    return [level for name, level in zip(detections['class'], alert_levels) if name != "human"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Wild animal detector")
+    parser.add_argument(
+        "--sources",
+        default=CAMERA_SOURCES,
+        help="Comma separated camera indexes or stream URLs (default: $CAMERA_SOURCES or 0)",
+    )
+    parser.add_argument(
+        "--rois",
+        default=CAMERA_ROIS,
+        help="Regions to run the model on, 'cam0=x1,y1,x2,y2;...' in normalized coordinates",
+    )
+    parser.add_argument(
+        "--motion-threshold",
+        type=float,
+        default=MOTION_THRESHOLD,
+        help="Fraction of changed pixels that triggers inference (0 runs the model on every frame)",
+    )
+    parser.add_argument(
+        "--keepalive",
+        type=float,
+        default=MOTION_KEEPALIVE,
+        help="Run the model at least this often (seconds) even without motion",
+    )
+    parser.add_argument(
+        "--cpu-budget",
+        type=float,
+        default=INFERENCE_CPU_BUDGET,
+        help="Share of wall time inference may use when no threat is in view (0-1)",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=("auto",) + BACKENDS,
+        default=MODEL_BACKEND,
+        help="Inference backend; 'auto' benchmarks the available ones and picks the fastest",
+    )
+    parser.add_argument(
+        "--int8-data",
+        help="Calibration dataset yaml, enables the openvino-int8 backend",
+    )
+    parser.add_argument(
+        "--rebenchmark",
+        action="store_true",
+        help="Ignore the cached backend choice and benchmark again",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=METRICS_PORT,
+        help="Serve Prometheus metrics on this port (0 disables)",
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        default=HEADLESS,
+        help="No windows or key polling; annotate frames only for annotated stream viewers",
+    )
+    parser.add_argument(
+        "--clip-pre",
+        type=float,
+        default=CLIP_PRE_SECONDS,
+        help="Seconds of pre-roll in the event clip attached to each alert",
+    )
+    parser.add_argument(
+        "--clip-post",
+        type=float,
+        default=CLIP_POST_SECONDS,
+        help="Seconds recorded after the alert (pre and post both 0 disables clips)",
+    )
+    parser.add_argument(
+        "--annotated-bus",
+        default=ANNOTATED_BUS,
+        help="Publish annotated frames to shared memory as <name>-<camera id> while someone watches",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    rois = parse_rois(args.rois)
+
+    cameras = [
+        Camera(
+            i, source,
+            MotionGate(threshold=args.motion_threshold, keepalive_seconds=args.keepalive),
+            display=not args.headless,
+            annotated_bus=args.annotated_bus,
+            rois=rois.get(f"cam{i}"),
+        )
+        for i, source in enumerate(parse_sources(args.sources))
+    ]
+    for camera_id in set(rois) - {c.id for c in cameras}:
+        log(f"⚠️ ROIs configured for unknown camera {camera_id}")
+    for camera in cameras:
+        if not camera.open():
+            log(f"⚠️ [{camera.id}] Could not open source {camera.source}")
+        if camera.rois is not None:
+            log(f"🔲 [{camera.id}] Running the model on {len(camera.rois)} region(s) of interest")
+        last_alert_data[camera.id] = {}
+    log(f"📷 Watching {len(cameras)} camera(s): {', '.join(str(c.source) for c in cameras)}")
+
+    # One model shared by every camera; frames are run through it as a batch.
+    # Exported artifacts are cached next to the weights and warmed up here.
+    backend, model = select_backend(
+        MODEL_PATH,
+        preference=args.backend,
+        batch=sum(1 if c.rois is None else len(c.rois) for c in cameras),
+        int8_data=args.int8_data,
+        rebenchmark=args.rebenchmark,
+    )
+    log(f"🧠 Inference backend: {backend}")
+
+    cadence = CadenceController(
+        cpu_budget=args.cpu_budget,
+        threat_cpu_budget=max(args.cpu_budget, THREAT_CPU_BUDGET),
+        idle_interval=IDLE_INTERVAL,
+    )
+
+    stop_event = threading.Event()
+    # Never drops: a herd can raise more alerts in one frame than the worker writes at once
+    alert_queue = DropOldestQueue("alerts", maxsize=None)
+
+    # Alerts are persisted first and delivered in order by a background sender
+    outbox = Outbox(OUTBOX_DB, OUTBOX_DIR)
+
+    # Event clips: every camera keeps a fixed pre-roll ring; a background
+    # worker adds the post-roll and encodes the clip the alert is sent with
+    clips = None
+    if args.clip_pre + args.clip_post > 0:
+        clips = ClipRecorder(os.path.join(OUTBOX_DIR, "clips"), outbox.attach_clip,
+                             args.clip_pre, args.clip_post, CLIP_FPS, CLIP_WIDTH)
+        for camera in cameras:
+            camera.clip_ring = clips.new_ring()
+    cameras_by_id = {camera.id: camera for camera in cameras}
+
+    sender = OutboxSender(outbox, upload_image, post_alert, upload_clip=upload_clip if clips else None,
+                          clip_wait=args.clip_post + CLIP_ENCODE_MARGIN, log=log)
+    log(f"📮 Outbox: {sender.summary()}")
+
+    def record_alert(job):
+        with timed("save"):
+            row_id = outbox.add(job['frame'], alert_payload(job), clip_pending=clips is not None)
+        if clips is not None:
+            clips.request(cameras_by_id[job['camera_id']].clip_ring, row_id, job['time'])
+        ALERTS.labels(job['camera_id'], job['class'], job['alert_level']).inc()
+        log(f"📮 Alert #{row_id} queued for delivery ({job['class']}, {job['alert_level']})")
+
+    def make_capture_stage(camera):
+        def capture_stage():
+            with timed("capture"):
+                ret, frame = camera.read()
+            if not ret:
+                log(f"❌ [{camera.id}] Camera read failed – stopping this camera")
+                return False
+            FRAMES.labels(camera.id, "captured").inc()
+
+            if camera.display is not None:
+                camera.display.put(frame)
+            if camera.clip_ring is not None:
+                camera.clip_ring.push(frame)
+            camera.frames.put(frame)
+        return capture_stage
+
+    def inference_stage():
+        # Latency-driven pacing keeps the model inside its CPU budget
+        if not cadence.wait_for_slot(stop_event):
+            return
+        batch = collect_latest(cameras)
+        # Only frames with motion (or due a keep-alive run) reach the model
+        ready = []
+        with timed("motion_gate"):
+            for camera, frame in batch:
+                passed = camera.motion_gate.check(frame)
+                FRAMES.labels(camera.id, "inferred" if passed else "gated").inc()
+                if passed:
+                    ready.append((camera, frame))
+        batch = ready
+        if not batch:
+            return
+
+        # Cameras with ROIs contribute one crop per region instead of the full frame
+        inputs, spans = [], []
+        for camera, frame in batch:
+            images = camera.model_inputs(frame)
+            spans.append((len(inputs), len(inputs) + len(images)))
+            inputs += images
+
+        # Ultralytics accepts a list of images and returns one result per image
+        cadence.start()
+        start = time.perf_counter()
+        results = model(inputs)
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels("inference").observe(elapsed)
+        for camera, _ in batch:
+            camera.motion_gate.record_inference(elapsed / len(batch))
+
+        alert_levels = []
+        for (camera, frame), (first, last) in zip(batch, spans):
+            with timed("postprocess"):
+                if camera.rois is None:
+                    detections = extract_detections(results[first], CONF_THRESHOLD)
+                else:
+                    # Crop-relative boxes back to full-frame normalized coordinates
+                    detections = merge_roi_detections(
+                        [extract_detections(r, CONF_THRESHOLD) for r in results[first:last]],
+                        camera.rois, frame.shape,
+                    )
+                detections['track_id'] = camera.tracker.update(detections)
+                alert_levels += process_detections(camera.id, frame, detections, alert_queue)
+            if camera.wants_annotation(frame.shape):
+                with timed("annotate"):
+                    if camera.rois is None:
+                        camera.show(results[first].plot())
+                    else:
+                        camera.show(draw_detections(frame, detections, camera.rois))
+
+        cadence.record(elapsed, alert_levels)
+
+    # A failed camera only stops its own capture worker
+    capture_workers = [
+        StageWorker(f"{c.id}-capture", make_capture_stage(c), stop_event, critical=False, log=log)
+        for c in cameras
+    ]
+    workers = capture_workers + [
+        StageWorker("inference", inference_stage, stop_event, log=log),
+        StageWorker("alerts", record_alert, stop_event, source=alert_queue, log=log),
+        StageWorker("sender", sender.step, stop_event, log=log),
+    ]
+    if clips is not None:
+        workers.append(StageWorker("clips", clips.step, stop_event, log=log))
+    queues = [c.frames for c in cameras] + [alert_queue] + [c.display for c in cameras if c.display]
+
+    # Before the workers start: nothing has to be shut down if this fails
+    if args.metrics_port:
+        watch_queues(queues)
+        watch_outbox(outbox)
+        watch_cadence(cadence)
+        try:
+            start_metrics_server(args.metrics_port)
+            log(f"📈 Metrics on http://0.0.0.0:{args.metrics_port}/metrics")
+        except OSError as e:
+            log(f"⚠️ Metrics server not started on port {args.metrics_port}: {e}")
+
+    for worker in workers:
+        worker.start()
+
+    # GUI calls have to stay on the main thread
+    last_stats = time.time()
+    try:
+        while not stop_event.is_set():
+            if args.headless:
+                stop_event.wait(0.5)
+            else:
+                for camera in cameras:
+                    frame = camera.display.get_nowait()
+                    if frame is not None:
+                        cv2.imshow(f"YOLOv8 Live - {camera.id}", frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+            if not any(w.is_alive() for w in capture_workers):
+                log("❌ No cameras left – stopping")
+                break
+
+            if time.time() - last_stats >= STATS_INTERVAL:
+                log(f"📊 {format_pipeline_stats(workers, queues)}")
+                log(f"⏱️ Cadence: {cadence.summary()}")
+                log(f"📮 Outbox: {sender.summary()}")
+                if clips is not None:
+                    log(f"🎬 Clips: {clips.summary()}")
+                for camera in cameras:
+                    log(f"🌙 [{camera.id}] Motion gate: {camera.motion_gate.summary()}")
+                last_stats = time.time()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        for q in queues:
+            q.close()
+        for worker in workers:
+            worker.join(timeout=5)
+
+        if not any(w.is_alive() for w in workers):
+            # Alerts raised just before shutdown still reach the outbox
+            while (job := alert_queue.get_nowait()) is not None:
+                record_alert(job)
+        log(f"📊 {format_pipeline_stats(workers, queues)}")
+        if clips is not None and not any(w.is_alive() for w in workers):
+            # Alerts still waiting for post-roll get the frames captured so far
+            clips.flush()
+            log(f"🎬 Clips: {clips.summary()}")
+        log(f"📮 Outbox: {sender.summary()}")
+        if not any(w.is_alive() for w in workers):
+            outbox.close()
+        for camera in cameras:
+            log(f"🌙 [{camera.id}] Motion gate: {camera.motion_gate.summary()}")
+            camera.release()
+        if not args.headless:
+            cv2.destroyAllWindows()
+        log_writer.close()
+
+
+if __name__ == "__main__":
+    main()